@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.encoding.data_encoder import Encoder
+from src.encoding.feature_encoder.simple_features import simple_features
+from src.labeling.common import LabelTypes
+from src.log.synthetic import synthetic_log
+from src.predictive_model.compiled_forest import compile_forest
+from src.predictive_model.predictive_model import drop_columns
+
+N_TRACES = 5000
+PREFIX_LENGTH = 10
+N_ESTIMATORS = 500
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+TIMINGS = 5
+
+
+def _best_time(function, timings=TIMINGS):
+    best = None
+    for _ in range(timings):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def benchmark_compiled_forest(n_traces=N_TRACES, prefix_length=PREFIX_LENGTH, n_estimators=N_ESTIMATORS,
+                              batch_sizes=BATCH_SIZES, seed=0) -> list:
+    dfs = [
+        simple_features(synthetic_log(n_traces, prefix_length, 20, seed=log_seed), prefix_length, True,
+                        LabelTypes.NEXT_ACTIVITY.value)
+        for log_seed in [seed, seed + 1]
+    ]
+    encoder = Encoder(df=dfs[0])
+    for df in dfs:
+        encoder.encode(df)
+    forest = RandomForestClassifier(n_estimators=n_estimators, random_state=seed)
+    forest.fit(drop_columns(dfs[0]), dfs[0]['label'])
+    X = drop_columns(dfs[1]).to_numpy(dtype=np.float32)
+
+    start = time.perf_counter()
+    compiled = compile_forest(forest, X)
+    compile_seconds = time.perf_counter() - start
+
+    results = []
+    for batch_size in batch_sizes:
+        batch = X[:batch_size]
+        forest_seconds, expected = _best_time(lambda: forest.predict_proba(batch))
+        compiled_seconds, probabilities = _best_time(lambda: compiled.predict_proba(batch))
+        assert np.array_equal(probabilities, expected)
+        results += [{
+            'batch_size': len(batch),
+            'forest_seconds': forest_seconds,
+            'compiled_seconds': compiled_seconds,
+            'compile_seconds': compile_seconds
+        }]
+    return results
+
+
+if __name__ == '__main__':
+    for result in benchmark_compiled_forest():
+        print('{batch_size:>6} rows: forest {forest_seconds:.4f}s compiled {compiled_seconds:.4f}s'.format(**result))
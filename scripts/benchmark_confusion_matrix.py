@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+from pandas import DataFrame
+
+from src.confusion_matrix_feedback.confusion_matrix_feedback import _retrieve_confusion_matrix_ids
+from src.encoding.data_encoder import Encoder, PADDING_VALUE
+
+N_CLASSES = 50
+N_ROWS = (10000, 100000, 1000000)
+ROWWISE_MAX_ROWS = 100000
+
+
+def _rowwise_confusion_matrix_ids(trace_ids, predicted, actual, encoder) -> dict:
+    # what _retrieve_confusion_matrix_ids used to do, one scan of the rows per (actual, predicted) pair
+    decoded_predicted = encoder.decode_column(predicted, 'label')
+    decoded_actual = encoder.decode_column(actual, 'label')
+    elements = np.column_stack((
+        trace_ids,
+        decoded_predicted,
+        decoded_actual
+    )).tolist()
+
+    confusion_matrix = {}
+    classes = list(encoder.get_values('label')[0])
+    if str(PADDING_VALUE) in classes: classes.remove(str(PADDING_VALUE))
+    for act in classes:
+        confusion_matrix[act] = {}
+        for pred in classes:
+            confusion_matrix[act][pred] = {
+                trace_id
+                for trace_id, predicted, actual in elements
+                if actual == act and predicted == pred
+            }
+
+    return confusion_matrix
+
+
+def _timed(retrieve_confusion_matrix_ids, trace_ids, predicted, actual, encoder):
+    start = time.perf_counter()
+    confusion_matrix = retrieve_confusion_matrix_ids(trace_ids, predicted=predicted, actual=actual, encoder=encoder)
+    return time.perf_counter() - start, confusion_matrix
+
+
+def benchmark_confusion_matrix(n_classes=N_CLASSES, n_rows=N_ROWS, seed=0) -> list:
+    random_state = np.random.RandomState(seed)
+    encoder = Encoder(df=DataFrame({'label': ['class_{}'.format(i) for i in range(n_classes)]}))
+    results = []
+    for rows in n_rows:
+        trace_ids = np.array(['trace_{}'.format(i) for i in range(rows)], dtype=object)
+        actual = random_state.randint(1, n_classes + 1, size=rows)
+        predicted = random_state.randint(1, n_classes + 1, size=rows)
+
+        grouped_seconds, confusion_matrix = _timed(
+            _retrieve_confusion_matrix_ids, trace_ids, predicted, actual, encoder)
+        rowwise_seconds = None
+        if rows <= ROWWISE_MAX_ROWS:
+            rowwise_seconds, expected = _timed(
+                _rowwise_confusion_matrix_ids, trace_ids, predicted, actual, encoder)
+            assert expected == confusion_matrix
+        results += [{
+            'classes': n_classes,
+            'rows': rows,
+            'rowwise_seconds': rowwise_seconds,
+            'grouped_seconds': grouped_seconds
+        }]
+    return results
+
+
+if __name__ == '__main__':
+    for result in benchmark_confusion_matrix():
+        rowwise = 'skipped' if result['rowwise_seconds'] is None else '{:.2f}s'.format(result['rowwise_seconds'])
+        print('{classes} classes, {rows:>8} rows, rowwise {rowwise:>8}, grouped {grouped_seconds:.2f}s'.format(
+            rowwise=rowwise, **result))
@@ -0,0 +1,123 @@
+import time
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from sklearn.preprocessing import LabelEncoder
+
+from src.confusion_matrix_feedback.randomise_features import randomise_features
+from src.encoding.data_encoder import Encoder, PADDING_VALUE
+from src.encoding.feature_encoder.frequency_features import frequency_features
+from src.labeling.common import LabelTypes
+from src.log.synthetic import synthetic_log
+
+N_ROWS = 1000000
+N_ACTIVITIES = 50
+PREFIX_LENGTH = 5
+
+
+class _RowwiseEncoder:
+    """What Encoder used to do, a LabelEncoder and a dict lookup per value, applied row by row"""
+
+    def __init__(self, df: DataFrame):
+        self._label_dict = {}
+        self._label_dict_decoder = {}
+        for column in df:
+            if column != 'trace_id':
+                if df[column].dtype != int or (df[column].dtype == int and np.any(df[column] < 0)):
+                    encoder = LabelEncoder().fit(
+                        sorted(pd.concat([pd.Series([str(PADDING_VALUE)]), df[column].apply(lambda x: str(x))])))
+                    classes = encoder.classes_
+                    transforms = encoder.transform(classes)
+                    self._label_dict[column] = dict(zip(classes, transforms))
+                    self._label_dict_decoder[column] = dict(zip(transforms, classes))
+
+    def encode(self, df: DataFrame) -> None:
+        for column in df:
+            if column in self._label_dict:
+                df[column] = df[column].apply(lambda x: self._label_dict[column].get(str(x), PADDING_VALUE))
+
+    def decode(self, df: DataFrame) -> None:
+        for column in df:
+            if column in self._label_dict_decoder:
+                df[column] = df[column].apply(lambda x: self._label_dict_decoder[column].get(x, PADDING_VALUE))
+
+
+def _timed_encoder(encoder_class, df) -> tuple:
+    """Fit, encode and decode seconds of encoder_class on a copy of df, with the encoded and decoded frames"""
+    df = df.copy()
+    start = time.perf_counter()
+    encoder = encoder_class(df=df)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoder.encode(df)
+    encode_time = time.perf_counter() - start
+    encoded = df.copy()
+
+    start = time.perf_counter()
+    encoder.decode(df)
+    decode_time = time.perf_counter() - start
+    return fit_time, encode_time, decode_time, encoded, df
+
+
+def synthetic_encoded_frame(n_rows, n_activities, prefix_length, seed=0) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    activities = np.array(['activity_{}'.format(i) for i in range(n_activities)], dtype=object)
+    return DataFrame({
+        'trace_id': np.arange(n_rows).astype(str),
+        **{'prefix_' + str(i + 1): activities[rng.integers(0, n_activities, n_rows)] for i in range(prefix_length)},
+        'label': rng.choice(['false', 'true'], n_rows)
+    })
+
+
+def check_frequency_encoding(n_traces=500, prefix_length=PREFIX_LENGTH, seed=0) -> None:
+    """Checks decode_rows and randomise_features on the sparse columns of the frequency encoding"""
+    df = frequency_features(
+        synthetic_log(n_traces, prefix_length, 10, seed=seed), prefix_length, True, LabelTypes.ATTRIBUTE_STRING.value)
+    encoder = Encoder(df=df)
+    encoder.encode(df)
+    decoded = encoder.decode_rows(df)
+    for index in range(len(df)):
+        assert np.array_equal(np.array(decoded[index].tolist()), encoder.decode_row(df.iloc[index]))
+
+    # the feedback values are strings, a pattern on a count column redraws the rows holding that count
+    encoder.decode(df)
+    column = df.columns[1]
+    counts = np.asarray(df[column].to_numpy())
+    assert (counts == 1).any()
+    randomised = randomise_features(
+        {'no_such_label': [([(column, '1')], 1)]}, df, rng=np.random.default_rng(seed))
+    randomised_counts = np.asarray(randomised[column].to_numpy())
+    assert np.array_equal(randomised_counts[counts != 1], counts[counts != 1])
+    assert not np.array_equal(randomised_counts[counts == 1], counts[counts == 1])
+
+
+def benchmark_data_encoder(n_rows=N_ROWS, n_activities=N_ACTIVITIES, prefix_length=PREFIX_LENGTH) -> dict:
+    df = synthetic_encoded_frame(n_rows, n_activities, prefix_length)
+
+    fit_time, encode_time, decode_time, encoded, decoded = _timed_encoder(Encoder, df)
+    rowwise_fit_time, rowwise_encode_time, rowwise_decode_time, expected_encoded, expected_decoded = \
+        _timed_encoder(_RowwiseEncoder, df)
+    assert_frame_equal(expected_encoded, encoded, check_exact=True)
+    assert_frame_equal(expected_decoded, decoded, check_exact=True)
+
+    return {
+        'rows': n_rows,
+        'fit_seconds': fit_time,
+        'encode_seconds': encode_time,
+        'decode_seconds': decode_time,
+        'rowwise_fit_seconds': rowwise_fit_time,
+        'rowwise_encode_seconds': rowwise_encode_time,
+        'rowwise_decode_seconds': rowwise_decode_time,
+        'encode_speedup': rowwise_encode_time / encode_time,
+        'decode_speedup': rowwise_decode_time / decode_time,
+        'encode_rows_per_second': n_rows / encode_time,
+        'decode_rows_per_second': n_rows / decode_time
+    }
+
+
+if __name__ == '__main__':
+    check_frequency_encoding()
+    print(benchmark_data_encoder())
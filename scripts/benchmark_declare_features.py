@@ -0,0 +1,101 @@
+import time
+
+import numpy as np
+
+from src.encoding.feature_encoder.declare_features.declare_features import declare_features, UNARY_TEMPLATES, \
+    BINARY_TEMPLATES, SATISFIED, VACUOUS, VIOLATED
+from src.labeling.common import LabelTypes
+from src.log.synthetic import synthetic_log
+
+N_TRACES = 5000
+N_ACTIVITIES = 20
+PREFIX_LENGTH = 20
+MIN_SUPPORT = 0.05
+
+
+def _naive_value(template, prefix, first, second=None):
+    """Value of one constraint on one prefix, walking its events as the templates are defined"""
+    def outcome(activated, satisfied):
+        return VACUOUS if not activated else SATISFIED if satisfied else VIOLATED
+
+    positions = {activity: [i for i, event in enumerate(prefix) if event == activity] for activity in [first, second]}
+    a, b = positions[first], positions[second]
+    if template == 'existence':
+        return outcome(True, len(a) > 0)
+    if template == 'absence2':
+        return outcome(True, len(a) < 2)
+    if template == 'exactly1':
+        return outcome(True, len(a) == 1)
+    if template == 'init':
+        return outcome(True, len(prefix) > 0 and prefix[0] == first)
+    if template == 'responded_existence':
+        return outcome(len(a) > 0, len(b) > 0)
+    if template == 'co_existence':
+        return outcome(len(a) > 0 or len(b) > 0, len(a) > 0 and len(b) > 0)
+    if template == 'response':
+        return outcome(len(a) > 0, all(any(j > i for j in b) for i in a))
+    if template == 'precedence':
+        return outcome(len(b) > 0, all(any(i < j for i in a) for j in b))
+    if template == 'succession':
+        return outcome(len(a) > 0 or len(b) > 0,
+                       all(any(j > i for j in b) for i in a) and all(any(i < j for i in a) for j in b))
+    if template == 'chain_response':
+        return outcome(len(a) > 0, all(i + 1 in b for i in a))
+    if template == 'chain_precedence':
+        return outcome(len(b) > 0, all(j - 1 in a for j in b))
+    raise Exception('unsupported declare template {}'.format(template))
+
+
+def naive_declare_features(log, prefix_length, activities) -> np.ndarray:
+    """Reference encoding evaluating every constraint on every prefix on its own"""
+    prefixes = [[event['concept:name'] for event in trace[:prefix_length]] for trace in log]
+    rows = []
+    for prefix in prefixes:
+        row = [_naive_value(template, prefix, activity) for template in UNARY_TEMPLATES for activity in activities]
+        row += [
+            _naive_value(template, prefix, first, second)
+            for first in activities
+            for template in BINARY_TEMPLATES
+            for second in activities
+            if second != first
+        ]
+        rows += [row]
+    return np.array(rows, dtype=np.int8)
+
+
+def benchmark_declare_features(n_traces=N_TRACES, n_activities=N_ACTIVITIES, prefix_length=PREFIX_LENGTH,
+                               min_support=MIN_SUPPORT, seed=0) -> dict:
+    log = synthetic_log(n_traces=n_traces, trace_length=prefix_length, n_activities=n_activities, seed=seed)
+
+    start = time.perf_counter()
+    df = declare_features(log, prefix_length, True, LabelTypes.ATTRIBUTE_STRING.value)
+    seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pruned_df = declare_features(log, prefix_length, True, LabelTypes.ATTRIBUTE_STRING.value, min_support=min_support)
+    pruned_seconds = time.perf_counter() - start
+
+    # the reference is checked on a slice of the log, walking all of it would take far longer than the encoder
+    sample = log[:max(1, n_traces // 50)]
+    activities = sorted({event['concept:name'] for trace in log for event in trace[:prefix_length]})
+    assert np.array_equal(
+        declare_features(sample, prefix_length, True, LabelTypes.ATTRIBUTE_STRING.value,
+                         feature_list=df.columns).iloc[:, 1:-1].to_numpy(),
+        naive_declare_features(sample, prefix_length, activities)
+    )
+
+    return {
+        'traces': n_traces,
+        'constraints': len(df.columns) - 2,
+        'seconds': seconds,
+        'traces_per_second': n_traces / seconds,
+        'pruned_constraints': len(pruned_df.columns) - 2,
+        'pruned_seconds': pruned_seconds
+    }
+
+
+if __name__ == '__main__':
+    result = benchmark_declare_features()
+    print('declare_features: {traces} traces, {constraints} constraints in {seconds:.2f}s '
+          '({traces_per_second:.0f} traces/s)'.format(**result))
+    print('pruned: {pruned_constraints} constraints in {pruned_seconds:.2f}s'.format(**result))
@@ -0,0 +1,113 @@
+import glob
+import time
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from pm4py.objects.log.log import EventLog
+
+from src.encoding.feature_encoder import simple_features as simple_encoder, complex_features as complex_encoder
+from src.labeling.common import LabelTypes
+from src.log.common import get_log
+from src.log.synthetic import synthetic_log
+
+REPETITIONS = 10
+TIMINGS = 3
+CHECK_PREFIX_LENGTHS = (1, 2, 5, 10, 15)
+
+
+def _rowwise_simple_features(log, prefix_length, padding, labeling_type):
+    return DataFrame(columns=simple_encoder._compute_columns(prefix_length), data=[
+        simple_encoder._trace_to_row(trace, prefix_length, padding, labeling_type)
+        for trace in log
+        if not (len(trace) <= prefix_length - 1 and not padding)
+    ])
+
+
+def _rowwise_complex_features(log, prefix_length, padding, labeling_type):
+    columns, additional_columns = complex_encoder._columns_complex(log, prefix_length)
+    return DataFrame(columns=columns, data=[
+        complex_encoder._trace_to_row(trace, prefix_length, additional_columns, padding, columns, labeling_type)
+        for trace in log
+        if not (len(trace) <= prefix_length - 1 and not padding)
+    ])
+
+
+ENCODERS = {
+    'simple': (_rowwise_simple_features, simple_encoder.simple_features),
+    'complex': (_rowwise_complex_features, complex_encoder.complex_features)
+}
+
+
+def _check_log(n_traces=200, trace_length=6, seed=0) -> EventLog:
+    """synthetic_log with the attributes the encoders treat apart: numeric, partly missing and nan ones, and one
+    holding ints at some positions and floats at others"""
+    log = synthetic_log(n_traces, trace_length, 5, n_attributes=2, seed=seed)
+    for trace_index, trace in enumerate(log):
+        for position, event in enumerate(trace):
+            event['cost'] = position * 10 + trace_index % 3
+            event['duration'] = float('nan') if (trace_index + position) % 7 == 0 else position / 2
+            event['amount'] = position * 3 if position % 2 == 0 else position * 1.5
+            if (trace_index + position) % 5 == 0:
+                del event._dict['attribute_1']
+    return log
+
+
+def check_encoding(log=None, prefix_lengths=CHECK_PREFIX_LENGTHS, paddings=(True, False),
+                   labeling_types=(LabelTypes.ATTRIBUTE_STRING.value, LabelTypes.NEXT_ACTIVITY.value)) -> int:
+    """Checks the vectorised encodings against the row by row ones, values and dtypes, returns the cases checked"""
+    log = _check_log() if log is None else log
+    checked = 0
+    for name, (rowwise, vectorised) in ENCODERS.items():
+        for prefix_length in prefix_lengths:
+            for padding in paddings:
+                for labeling_type in labeling_types:
+                    expected = rowwise(log, prefix_length, padding, labeling_type)
+                    actual = vectorised(log, prefix_length, padding, labeling_type)
+                    try:
+                        assert_frame_equal(expected, actual, check_exact=True)
+                    except AssertionError as e:
+                        raise AssertionError('{} encoding differs at prefix_length={} padding={} {}: {}'.format(
+                            name, prefix_length, padding, labeling_type, e))
+                    checked += 1
+    return checked
+
+
+def _traces_per_second(encoder, log, prefix_length, padding, labeling_type):
+    timings = []
+    for _ in range(TIMINGS):
+        start = time.perf_counter()
+        df = encoder(log, prefix_length, padding, labeling_type)
+        timings += [time.perf_counter() - start]
+    return len(log) / min(timings), df
+
+
+def benchmark_encoding(log, prefix_lengths=(1, 5, 10, 20), paddings=(True, False),
+                       labeling_types=(LabelTypes.ATTRIBUTE_STRING.value, LabelTypes.NEXT_ACTIVITY.value)):
+    results = []
+    for name, (rowwise, vectorised) in ENCODERS.items():
+        for prefix_length in prefix_lengths:
+            for padding in paddings:
+                for labeling_type in labeling_types:
+                    rowwise_tps, expected = _traces_per_second(rowwise, log, prefix_length, padding, labeling_type)
+                    vectorised_tps, actual = _traces_per_second(vectorised, log, prefix_length, padding, labeling_type)
+                    assert_frame_equal(expected, actual, check_exact=True)
+                    results += [{
+                        'encoder': name,
+                        'prefix_length': prefix_length,
+                        'padding': padding,
+                        'labeling_type': labeling_type,
+                        'rowwise_traces_per_second': rowwise_tps,
+                        'vectorised_traces_per_second': vectorised_tps
+                    }]
+    return results
+
+
+if __name__ == '__main__':
+    print('{} encodings equal to the row by row ones'.format(check_encoding()))
+    log = EventLog([trace for filepath in sorted(glob.glob('input_data/*.xes')) for trace in get_log(filepath)])
+    log = EventLog(list(log) * REPETITIONS)
+    print('{} traces'.format(len(log)))
+    for result in benchmark_encoding(log):
+        print('{encoder:<8} prefix_length={prefix_length:<3} padding={padding!s:<6} {labeling_type:<24} '
+              'rowwise {rowwise_traces_per_second:>9.0f} traces/s, '
+              'vectorised {vectorised_traces_per_second:>9.0f} traces/s'.format(**result))
@@ -0,0 +1,63 @@
+import glob
+import multiprocessing
+import resource
+import time
+
+import hyperopt
+from hyperopt import Trials, fmin
+
+from scripts.benchmark_models import encoded_predictive_model
+from src.hyperparameter_optimisation.common import retrieve_best_model, _get_space, HyperoptTarget, ModelSelection
+from src.log.common import get_log
+from src.predictive_model.common import PredictionMethods
+
+MAX_EVALUATIONS = 20
+PREFIX_LENGTH = 5
+
+
+def _search(model_selection, train_filepath, validate_filepath):
+    predictive_model = encoded_predictive_model(get_log(train_filepath), get_log(validate_filepath), PREFIX_LENGTH)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if model_selection is None:
+        # what retrieve_best_model used to do, every fitted model stays in the trials
+        trials = Trials()
+        fmin(
+            lambda x: predictive_model.train_and_evaluate_configuration(config=x, target=HyperoptTarget.F1.value),
+            _get_space(PredictionMethods.RANDOM_FOREST.value),
+            algo=hyperopt.tpe.suggest,
+            max_evals=MAX_EVALUATIONS,
+            trials=trials
+        )
+    else:
+        retrieve_best_model(
+            predictive_model,
+            PredictionMethods.RANDOM_FOREST.value,
+            MAX_EVALUATIONS,
+            HyperoptTarget.F1.value,
+            model_selection=model_selection
+        )
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss / 1024,
+        'peak_rss_delta_mb': (peak_rss - rss_before) / 1024
+    }
+
+
+def benchmark_hyperopt_memory(train_filepath, validate_filepath) -> dict:
+    # every search runs in a fresh process so that the peak RSS is its own
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name, model_selection in [('all_models_in_trials', None),
+                                  (ModelSelection.KEEP_BEST.value, ModelSelection.KEEP_BEST.value),
+                                  (ModelSelection.REFIT.value, ModelSelection.REFIT.value)]:
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(_search, (model_selection, train_filepath, validate_filepath))
+    return results
+
+
+if __name__ == '__main__':
+    filepaths = sorted(glob.glob('input_data/*.xes'))
+    for name, result in benchmark_hyperopt_memory(filepaths[0], filepaths[-1]).items():
+        print('{:<22} {seconds:.1f}s, peak RSS {peak_rss_mb:.1f}MB (+{peak_rss_delta_mb:.1f}MB)'.format(name, **result))
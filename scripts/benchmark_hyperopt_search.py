@@ -0,0 +1,44 @@
+import glob
+import time
+
+from scripts.benchmark_models import encoded_predictive_model
+from src.hyperparameter_optimisation.common import retrieve_best_model, HyperoptTarget, SearchMode
+from src.predictive_model.common import PredictionMethods
+from src.predictive_model.predictive_model import drop_columns
+from src.evaluation.common import evaluate
+from src.log.common import get_log
+
+MAX_EVALUATIONS = 50
+PREFIX_LENGTH = 5
+SEEDS = [1, 2, 3]
+
+
+def benchmark_hyperopt_search(train_filepath, validate_filepath, max_evaluations=MAX_EVALUATIONS, seeds=SEEDS):
+    predictive_model = encoded_predictive_model(get_log(train_filepath), get_log(validate_filepath), PREFIX_LENGTH)
+    results = []
+    for seed in seeds:
+        for search_mode in [SearchMode.TPE.value, SearchMode.SUCCESSIVE_HALVING.value]:
+            start = time.perf_counter()
+            model, config = retrieve_best_model(
+                predictive_model,
+                PredictionMethods.RANDOM_FOREST.value,
+                max_evaluations,
+                HyperoptTarget.F1.value,
+                seed=seed,
+                search_mode=search_mode
+            )
+            elapsed = time.perf_counter() - start
+            validate_df = drop_columns(predictive_model.full_validate_df)
+            result = evaluate(
+                predictive_model.full_validate_df['label'],
+                model.predict(validate_df),
+                model.predict_proba(validate_df)[:, 1]
+            )
+            results += [{'search_mode': search_mode, 'seed': seed, 'seconds': elapsed, **result}]
+    return results
+
+
+if __name__ == '__main__':
+    filepaths = sorted(glob.glob('input_data/*.xes'))
+    for result in benchmark_hyperopt_search(filepaths[0], filepaths[-1]):
+        print('{search_mode:<20} seed={seed} {seconds:>6.1f}s f1={f1_score:.4f} auc={auc:.4f}'.format(**result))
@@ -0,0 +1,78 @@
+import glob
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+from src.log.common import get_log, warm_log_cache
+
+CACHE_DIR = 'output_data/log_cache'
+
+
+def _consume(filepath, streaming, cache_dir):
+    n_traces, n_events = 0, 0
+    for trace in get_log(filepath=filepath, streaming=streaming, cache_dir=cache_dir):
+        n_traces += 1
+        n_events += len(trace)
+    return n_traces, n_events
+
+
+def _load(filepath, streaming, cache_dir):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    n_traces, n_events = _consume(filepath, streaming, cache_dir)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # second, slower, pass to trace the python allocations which are not hidden by the import peak
+    tracemalloc.start()
+    _consume(filepath, streaming, cache_dir)
+    _, peak_allocated = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'traces': n_traces,
+        'events': n_events,
+        'seconds': elapsed,
+        'peak_rss_mb': peak_rss / 1024,
+        'peak_rss_delta_mb': (peak_rss - rss_before) / 1024,
+        'peak_allocated_mb': peak_allocated / 2 ** 20
+    }
+
+
+def check_log_cache(filepath, cache_dir=CACHE_DIR) -> None:
+    """Checks the cached log of filepath is the parsed one, log level values included"""
+    parsed = get_log(filepath=filepath)
+    get_log(filepath=filepath, cache_dir=cache_dir)
+    cached = get_log(filepath=filepath, cache_dir=cache_dir)
+    for name in ['attributes', 'extensions', 'omni_present', 'classifiers']:
+        assert getattr(cached, name) == getattr(parsed, name), name
+    assert len(cached) == len(parsed)
+    for parsed_trace, cached_trace in zip(parsed, cached):
+        assert dict(cached_trace.attributes) == dict(parsed_trace.attributes)
+        assert [dict(event) for event in cached_trace] == [dict(event) for event in parsed_trace]
+
+
+def benchmark_log_loading(filepaths):
+    # every measurement runs in a fresh process so that peak RSS is not shared between the importers
+    context = multiprocessing.get_context('spawn')
+    warm_log_cache('input_data', CACHE_DIR)
+    results = {}
+    for filepath in filepaths:
+        results[filepath] = {}
+        for name, streaming, cache_dir in [('import_log_xes', False, None),
+                                           ('iterparse_xes', True, None),
+                                           ('log_cache', False, CACHE_DIR)]:
+            with context.Pool(1) as pool:
+                results[filepath][name] = pool.apply(_load, (filepath, streaming, cache_dir))
+    return results
+
+
+if __name__ == '__main__':
+    for filepath in sorted(glob.glob('input_data/*.xes')):
+        check_log_cache(filepath)
+    for filepath, result in benchmark_log_loading(sorted(glob.glob('input_data/*.xes'))).items():
+        print(filepath)
+        for name, measures in result.items():
+            print('\t{:<16} {traces} traces, {events} events, {seconds:.2f}s, '
+                  'peak RSS {peak_rss_mb:.1f}MB (+{peak_rss_delta_mb:.1f}MB), '
+                  'peak allocated {peak_allocated_mb:.1f}MB'.format(name, **measures))
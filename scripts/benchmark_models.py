@@ -0,0 +1,20 @@
+from pm4py.objects.log.log import EventLog
+
+from src.encoding.data_encoder import Encoder
+from src.encoding.feature_encoder.simple_features import simple_features
+from src.labeling.common import LabelTypes
+from src.predictive_model.common import PredictionMethods
+from src.predictive_model.predictive_model import PredictiveModel
+
+
+def encoded_predictive_model(train_log: EventLog, validate_log: EventLog, prefix_length: int,
+                             labeling_type: str = LabelTypes.ATTRIBUTE_STRING.value,
+                             model_type: str = PredictionMethods.RANDOM_FOREST.value) -> PredictiveModel:
+    """PredictiveModel on the simple encoding of train_log and validate_log, as the benchmarks tune it"""
+    train_df, validate_df = [
+        simple_features(log, prefix_length, True, labeling_type) for log in [train_log, validate_log]
+    ]
+    encoder = Encoder(df=train_df)
+    encoder.encode(train_df)
+    encoder.encode(validate_df)
+    return PredictiveModel(model_type, train_df, validate_df)
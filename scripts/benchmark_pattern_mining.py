@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+from pymining import itemmining
+
+from src.confusion_matrix_feedback.pattern_mining import mine_frequent_itemsets, MiningBackend
+
+N_CLASSES = 10
+N_TRANSACTIONS = 200
+N_FEATURES = 30
+N_VALUES = 4
+THRESHOLD = 13
+
+
+def _cells(n_classes, n_transactions, seed):
+    """Transactions shaped like the filtered explanations, THRESHOLD (feature, value) items out of N_FEATURES"""
+    random_state = np.random.RandomState(seed)
+    return {
+        (actual, predicted): [
+            [
+                ('prefix_{}'.format(feature), 'activity_{}'.format(random_state.randint(N_VALUES)))
+                for feature in random_state.choice(N_FEATURES, size=THRESHOLD, replace=False)
+            ]
+            for _ in range(n_transactions)
+        ]
+        for actual in range(n_classes)
+        for predicted in range(n_classes)
+    }
+
+
+def _timed(cells, backend, n_workers, max_length):
+    start = time.perf_counter()
+    mined = mine_frequent_itemsets(cells, min_support=2, backend=backend, max_length=max_length,
+                                   n_workers=n_workers)
+    return time.perf_counter() - start, mined
+
+
+def _unpruned_relim(cells, max_length) -> dict:
+    """Itemsets of pymining's relim, which mines them all, filtered down to the ones of at most max_length items"""
+    return {
+        cell: {
+            tuple(sorted(itemset)): support
+            for itemset, support in itemmining.relim(itemmining.get_relim_input(transactions), min_support=2).items()
+            if len(itemset) <= max_length
+        }
+        for cell, transactions in cells.items()
+    }
+
+
+def benchmark_pattern_mining(n_classes=N_CLASSES, n_transactions=N_TRANSACTIONS, max_length=4, seed=0) -> list:
+    cells = _cells(n_classes, n_transactions, seed)
+    relim_seconds, expected = _timed(cells, MiningBackend.RELIM.value, 1, max_length)
+    assert expected == _unpruned_relim(cells, max_length)
+    results = [{'backend': MiningBackend.RELIM.value, 'n_workers': 1, 'seconds': relim_seconds}]
+    for backend, n_workers in [(MiningBackend.RELIM.value, 4), (MiningBackend.ECLAT.value, 1),
+                               (MiningBackend.ECLAT.value, 4)]:
+        seconds, mined = _timed(cells, backend, n_workers, max_length)
+        assert mined == expected
+        results += [{'backend': backend, 'n_workers': n_workers, 'seconds': seconds}]
+    return results
+
+
+if __name__ == '__main__':
+    for result in benchmark_pattern_mining():
+        print('{backend:<6} {n_workers} workers {seconds:.2f}s'.format(**result))
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.encoding.data_encoder import Encoder
+from src.encoding.feature_encoder.simple_features import simple_features
+from src.labeling.common import LabelTypes
+from src.log.synthetic import synthetic_log
+from src.predictive_model.predictive_model import drop_columns
+from src.serving.prediction_service import PredictionService
+
+N_TRACES = 2000
+PREFIX_LENGTH = 10
+N_ACTIVITIES = 20
+N_ESTIMATORS = 100
+
+
+async def _replay(service, log) -> dict:
+    """Replays the traces event by event, all of them at once, keeping the predictions on the offline prefixes"""
+    batcher = asyncio.ensure_future(service.run())
+    offline_predictions = {}
+
+    async def replay_trace(trace):
+        case_id = trace.attributes['concept:name']
+        for position, event in enumerate(trace):
+            response = await service.predict({
+                'case_id': case_id, 'activity': event['concept:name'], 'end': position == len(trace) - 1
+            })
+            if position + 1 == min(len(trace), service.prefix_length):
+                offline_predictions[case_id] = response['probabilities']
+
+    await asyncio.gather(*[replay_trace(trace) for trace in log])
+    batcher.cancel()
+    return offline_predictions
+
+
+def benchmark_serving(n_traces=N_TRACES, prefix_length=PREFIX_LENGTH, seed=0) -> dict:
+    train_df = simple_features(
+        synthetic_log(n_traces, prefix_length, N_ACTIVITIES, seed=seed),
+        prefix_length, True, LabelTypes.NEXT_ACTIVITY.value
+    )
+    encoder = Encoder(df=train_df)
+    encoder.encode(train_df)
+    model = RandomForestClassifier(n_estimators=N_ESTIMATORS, random_state=seed)
+    model.fit(drop_columns(train_df), train_df['label'])
+
+    log = synthetic_log(n_traces, prefix_length, N_ACTIVITIES, seed=seed + 1)
+    service = PredictionService(model, encoder, drop_columns(train_df).columns)
+    start = time.perf_counter()
+    predictions = asyncio.run(_replay(service, log))
+    seconds = time.perf_counter() - start
+
+    # the prefixes built event by event are the ones the offline encoding builds from the whole traces
+    test_df = simple_features(log, prefix_length, True, LabelTypes.NEXT_ACTIVITY.value)
+    encoder.encode(test_df)
+    labels = [str(label) for label in encoder.decode_column(model.classes_, 'label')]
+    expected = model.predict_proba(drop_columns(test_df).to_numpy(dtype=np.float32))
+    served = np.array([[predictions[trace_id][label] for label in labels] for trace_id in test_df['trace_id']])
+    assert np.allclose(served, expected)
+
+    return dict(service.metrics_summary(), seconds=seconds)
+
+
+if __name__ == '__main__':
+    result = benchmark_serving()
+    print('{events} events in {seconds:.2f}s, {throughput:.0f} events/s, {mean_batch_size:.1f} events per batch'
+          .format(**result))
+    print('latency p50 {latency_p50_ms:.2f}ms p99 {latency_p99_ms:.2f}ms'.format(**result))
@@ -0,0 +1,63 @@
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.encoding.data_encoder import Encoder
+from src.encoding.feature_encoder.simple_features import simple_features
+from src.explanation.wrappers import shap_wrapper
+from src.labeling.common import LabelTypes
+from src.log.common import get_log
+from src.predictive_model.predictive_model import drop_columns
+
+TRAIN_DATA = 'input_data/d1_validation_explainability_38-40.xes'
+FEEDBACK_DATA = 'input_data/d1_test_explainability_40-50.xes'
+PREFIX_LENGTH = 5
+
+
+def _rowwise_explanation(explainer, model, target_df, encoder):
+    # what shap_wrapper._get_explanation used to do, one explainer and one model call per row
+    return {
+        str(row['trace_id']):
+            np.column_stack((
+                drop_columns(target_df).columns,
+                encoder.decode_row(drop_columns(row.to_frame(0).T).squeeze()),
+                explainer.shap_values(
+                    drop_columns(row.to_frame(0).T)
+                )[int(model.predict(drop_columns(row.to_frame().T))[0]) - 1].T
+            )).tolist()
+        for _, row in target_df.iterrows()
+    }
+
+
+def _timed(get_explanation, explainer, model, feedback_df, encoder):
+    start = time.perf_counter()
+    explanations = get_explanation(explainer, model, feedback_df, encoder)
+    return time.perf_counter() - start, explanations
+
+
+def benchmark_shap_explanation(train_filepath, feedback_filepath, prefix_length=PREFIX_LENGTH) -> dict:
+    train_df, feedback_df = [
+        simple_features(get_log(filepath), prefix_length, True, LabelTypes.ATTRIBUTE_STRING.value)
+        for filepath in [train_filepath, feedback_filepath]
+    ]
+    encoder = Encoder(df=train_df)
+    encoder.encode(train_df)
+    encoder.encode(feedback_df)
+    model = RandomForestClassifier(n_estimators=100, random_state=0)
+    model.fit(drop_columns(train_df), train_df['label'])
+    explainer = shap_wrapper._init_explainer(model, drop_columns(train_df))
+
+    rowwise_seconds, expected = _timed(_rowwise_explanation, explainer, model, feedback_df, encoder)
+    batched_seconds, actual = _timed(shap_wrapper._get_explanation, explainer, model, feedback_df, encoder)
+    assert expected == actual
+    return {
+        'traces': len(feedback_df),
+        'rowwise_seconds': rowwise_seconds,
+        'batched_seconds': batched_seconds
+    }
+
+
+if __name__ == '__main__':
+    result = benchmark_shap_explanation(TRAIN_DATA, FEEDBACK_DATA)
+    print('{traces} traces, rowwise {rowwise_seconds:.1f}s, batched {batched_seconds:.1f}s'.format(**result))
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from scripts.run_full_pipeline import run_full_pipeline
+from src.confusion_matrix_feedback.confusion_matrix_feedback import compute_feedback
+from src.confusion_matrix_feedback.pattern_mining import MiningBackend
+from src.confusion_matrix_feedback.randomise_features import randomise_features
+from src.encoding.common import EncodingType
+from src.encoding.data_encoder import Encoder
+from src.encoding.feature_encoder.complex_features import complex_features
+from src.encoding.feature_encoder.simple_features import simple_features
+from src.explanation.common import explain, ExplainerType
+from src.hyperparameter_optimisation.common import retrieve_best_model, HyperoptTarget
+from src.instrumentation.common import measured
+from src.labeling.common import LabelTypes
+from src.log.common import get_log
+from src.log.synthetic import write_synthetic_log
+from src.predictive_model.common import PredictionMethods
+from src.predictive_model.predictive_model import PredictiveModel
+
+SCALES = {
+    'small': {'n_traces': 200, 'trace_length': 10, 'n_activities': 8, 'n_attributes': 2},
+    'medium': {'n_traces': 2000, 'trace_length': 20, 'n_activities': 20, 'n_attributes': 4},
+    'large': {'n_traces': 20000, 'trace_length': 40, 'n_activities': 50, 'n_attributes': 8}
+}
+SPLITS = ['train', 'validate', 'feedback', 'test']
+PREFIX_LENGTH = 5
+MAX_EVALUATIONS = 3
+TIMINGS = 3
+THRESHOLD = 0.2
+
+
+def _write_logs(directory, scale):
+    filepaths = {split: os.path.join(directory, split + '.xes') for split in SPLITS}
+    for seed, split in enumerate(SPLITS):
+        write_synthetic_log(filepaths[split], seed=seed, **SCALES[scale])
+    return filepaths
+
+
+def _measure(name, function, items=None, timings=TIMINGS):
+    """Fastest of timings runs of function, with its cpu time, peak RSS and throughput
+
+    items is the number of items processed by function, or a function of its result returning it.
+    """
+    best = None
+    for _ in range(timings):
+        with measured(name, 'benchmark') as span:
+            result = function()
+            span['items'] = items(result) if callable(items) else items
+        if best is None or span['wall_time'] < best['wall_time']:
+            best = span
+    return best, result
+
+
+def benchmark_subsystems(filepaths: dict) -> dict:
+    results = {}
+
+    results['get_log'], logs = _measure(
+        'get_log',
+        lambda: {split: get_log(filepath) for split, filepath in filepaths.items()},
+        items=lambda logs: sum(len(log) for log in logs.values())
+    )
+    n_traces = results['get_log']['items']
+
+    for name, features in [(EncodingType.SIMPLE.value, simple_features),
+                           (EncodingType.COMPLEX.value, complex_features)]:
+        results[name + '_features'], _ = _measure(name + '_features', lambda: [
+            features(log, PREFIX_LENGTH, True, LabelTypes.ATTRIBUTE_STRING.value) for log in logs.values()
+        ], items=n_traces)
+
+    dfs = {
+        split: simple_features(log, PREFIX_LENGTH, True, LabelTypes.ATTRIBUTE_STRING.value)
+        for split, log in logs.items()
+    }
+    encoder = Encoder(df=dfs['train'])
+    results['encoder_encode'], _ = _measure(
+        'encoder_encode', lambda: [encoder.encode(df.copy()) for df in dfs.values()], items=n_traces)
+    for df in dfs.values():
+        encoder.encode(df)
+
+    predictive_model = PredictiveModel(PredictionMethods.RANDOM_FOREST.value, dfs['train'], dfs['validate'])
+    results['retrieve_best_model'], (predictive_model.model, predictive_model.config) = _measure(
+        'retrieve_best_model',
+        lambda: retrieve_best_model(
+            predictive_model, PredictionMethods.RANDOM_FOREST.value, MAX_EVALUATIONS, HyperoptTarget.F1.value, seed=0),
+        items=MAX_EVALUATIONS,
+        timings=1
+    )
+
+    results['explain_shap'], explanations = _measure(
+        'explain_shap',
+        lambda: explain(ExplainerType.SHAP.value, predictive_model, dfs['feedback'], encoder),
+        items=len(dfs['feedback'])
+    )
+
+    for backend in [MiningBackend.RELIM.value, MiningBackend.ECLAT.value]:
+        results['compute_feedback_' + backend], feedback = _measure(
+            'compute_feedback_' + backend,
+            lambda: compute_feedback(
+                explanations, predictive_model, dfs['feedback'], encoder, top_k=10, mining_backend=backend),
+            items=len(explanations)
+        )
+
+    train_df = dfs['train'].copy()
+    encoder.decode(train_df)
+    results['randomise_features'], _ = _measure(
+        'randomise_features', lambda: randomise_features(feedback, train_df), items=len(train_df))
+    return results
+
+
+def benchmark_pipeline(filepaths: dict) -> dict:
+    CONF = {
+        'data': {
+            'TRAIN_DATA': filepaths['train'],
+            'VALIDATE_DATA': filepaths['validate'],
+            'FEEDBACK_DATA': filepaths['feedback'],
+            'TEST_DATA': filepaths['test'],
+            'OUTPUT_DATA': os.path.dirname(filepaths['train'])
+        },
+        'prefix_length': PREFIX_LENGTH,
+        'padding': True,
+        'feature_selection': EncodingType.SIMPLE.value,
+        'labeling_type': LabelTypes.ATTRIBUTE_STRING.value,
+        'predictive_model': PredictionMethods.RANDOM_FOREST.value,
+        'explanator': ExplainerType.SHAP.value,
+        'explanation_workers': 1,
+        'explanation_sample_per_cell': None,
+        'threshold': 13,
+        'top_k': 10,
+        'feedback_mining_backend': MiningBackend.ECLAT.value,
+        'hyperparameter_optimisation': True,
+        'hyperparameter_optimisation_target': HyperoptTarget.F1.value,
+        'hyperparameter_optimisation_epochs': MAX_EVALUATIONS,
+        'hyperparameter_optimisation_workers': 1,
+        'hyperparameter_optimisation_reuse_tolerance': None,
+        'retrain_repetitions': 3,
+        'retrain_workers': 1,
+        'seed': 0
+    }
+    result, _ = _measure('run_full_pipeline', lambda: run_full_pipeline(CONF), timings=1)
+    return {'run_full_pipeline': result}
+
+
+def run_benchmarks(scale: str = 'small') -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        filepaths = _write_logs(directory, scale)
+        results = benchmark_subsystems(filepaths)
+        results.update(benchmark_pipeline(filepaths))
+    return {'scale': scale, 'parameters': SCALES[scale], 'results': results}
+
+
+def compare(report: dict, baseline: dict, threshold: float = THRESHOLD) -> list:
+    """Benchmarks whose wall time grew by more than threshold, as a fraction of the baseline one"""
+    if report['scale'] != baseline['scale']:
+        raise Exception('baseline was measured at scale {}'.format(baseline['scale']))
+    regressions = []
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        baseline_time = baseline['results'][name]['wall_time']
+        if result['wall_time'] > baseline_time * (1 + threshold):
+            regressions += [{
+                'benchmark': name,
+                'wall_time': result['wall_time'],
+                'baseline_wall_time': baseline_time,
+                'slowdown': result['wall_time'] / baseline_time - 1 if baseline_time > 0 else None
+            }]
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the encode, train, explain and feedback pipeline')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--output', default='output_data/benchmark.json')
+    parser.add_argument('--baseline', help='json report of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slowdown, as a fraction of the baseline wall time, above which a benchmark regressed')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.scale)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    for name, result in report['results'].items():
+        print('{:<28} {wall_time:>8.2f}s wall {cpu_time:>8.2f}s cpu {process_peak_rss_mb:>8.1f}MB peak '
+              '(+{peak_rss_growth_mb:.1f}MB)'.format(name, **result))
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        for regression in regressions:
+            print('REGRESSION {benchmark}: {wall_time:.2f}s against {baseline_wall_time:.2f}s'.format(**regression))
+        sys.exit(1 if regressions else 0)
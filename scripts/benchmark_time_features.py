@@ -0,0 +1,42 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.encoding.feature_encoder.time_features import date_features, time_features
+from src.labeling.common import LabelTypes
+from src.log.synthetic import synthetic_log
+
+N_TIMESTAMPS = 1000000
+PREFIX_LENGTH = 10
+
+
+def benchmark_time_features(n_timestamps=N_TIMESTAMPS, prefix_length=PREFIX_LENGTH, seed=0) -> dict:
+    random_state = np.random.RandomState(seed)
+    seconds = random_state.randint(0, 10 * 365 * 86400, size=n_timestamps)
+    timestamps = pd.Timestamp('2015-01-01') + pd.to_timedelta(seconds, unit='s')
+    strings = timestamps.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
+
+    start = time.perf_counter()
+    date_features(strings)
+    date_seconds = time.perf_counter() - start
+
+    log = synthetic_log(n_traces=n_timestamps // (2 * prefix_length), trace_length=2 * prefix_length, n_activities=20)
+    n_events = sum(len(trace) for trace in log)
+    start = time.perf_counter()
+    time_features(log, prefix_length, True, LabelTypes.ATTRIBUTE_STRING.value)
+    prefix_seconds = time.perf_counter() - start
+
+    return {
+        'timestamps': n_timestamps,
+        'date_features_seconds': date_seconds,
+        'traces': len(log),
+        'events': n_events,
+        'time_features_seconds': prefix_seconds
+    }
+
+
+if __name__ == '__main__':
+    result = benchmark_time_features()
+    print('date_features: {timestamps} timestamps in {date_features_seconds:.2f}s'.format(**result))
+    print('time_features: {traces} traces, {events} events in {time_features_seconds:.2f}s'.format(**result))
@@ -1,69 +1,132 @@
+import copy
 import itertools
 import logging
+import os
 from statistics import stdev, mean
 
 from src.encoding.common import get_encoded_df, EncodingType
 from src.evaluation.common import evaluate
 from src.explanation.common import explain, ExplainerType
-from src.confusion_matrix_feedback.confusion_matrix_feedback import compute_feedback
-from src.confusion_matrix_feedback.randomise_features import randomise_features
+from src.explanation.explanation_store import ExplanationStore
+from src.confusion_matrix_feedback.confusion_matrix_feedback import compute_feedback, feedback_stability
+from src.confusion_matrix_feedback.pattern_mining import MiningBackend
+from src.confusion_matrix_feedback.retrain import retrain_with_feedback
 from src.hyperparameter_optimisation.common import retrieve_best_model, HyperoptTarget
+from src.instrumentation.common import RECORDER
 from src.labeling.common import LabelTypes
 from src.log.common import get_log
+from src.log.log_cache import cache_key
+from src.pipeline.stages import Stage, run_stages
+from src.predictive_model.compiled_forest import compile_forest
 from src.predictive_model.common import PredictionMethods
-from src.predictive_model.predictive_model import PredictiveModel, drop_columns
+from src.predictive_model.predictive_model import PredictiveModel, drop_columns, model_input
 
 logger = logging.getLogger(__name__)
 
-def dict_mean(dict_list):
+def dict_mean(dict_list, failures=()):
+    """Statistics of every key of the results in dict_list, along with the failures that left no result
+
+    With no result the statistics are empty, with a single one its stdev is None.
+    """
     mean_dict = {
         'avg': dict(),
         'min': dict(),
         'max': dict(),
-        'stdev': dict()
+        'stdev': dict(),
+        'failures': list(failures)
     }
-    for key in dict_list[0].keys():
+    for key in (dict_list[0].keys() if dict_list else []):
         values = [d[key] for d in dict_list]
         mean_dict['avg'][key] = mean(values)
         mean_dict['min'][key] = min(values)
         mean_dict['max'][key] = max(values)
-        mean_dict['stdev'][key] = stdev(values)
+        mean_dict['stdev'][key] = stdev(values) if len(values) > 1 else None
     return mean_dict
 
 
+def default_conf():
+    return {  # This contains the configuration for the run
+        'data':
+            {
+                'TRAIN_DATA': 'input_data/' + 'd1_train_explainability_0-38.xes',
+                'VALIDATE_DATA': 'input_data/' + 'd1_validation_explainability_38-40.xes',
+                'FEEDBACK_DATA': 'input_data/' + 'd1_test_explainability_40-50.xes',
+                'TEST_DATA': 'input_data/' + 'd1_test2_explainability_50-60.xes',
+                'OUTPUT_DATA': 'output_data',
+                'CACHE_DATA': 'output_data/log_cache',
+                # opt in, e.g. 'output_data/hyperopt_store', the searches then start from the trials of earlier runs
+                'HYPEROPT_STORE': None,
+                # opt in, e.g. 'output_data/explanation_store'
+                'EXPLANATION_STORE': None,
+                'CHECKPOINT_DATA': 'output_data/checkpoints',
+            },
+        'prefix_length': 5,
+        'padding': True,
+        'feature_selection': EncodingType.SIMPLE.value,
+        'declare_min_support': None,
+        'labeling_type': LabelTypes.ATTRIBUTE_STRING.value,
+        'predictive_model': PredictionMethods.RANDOM_FOREST.value,
+        'compiled_inference': False,
+        'explanator': ExplainerType.SHAP.value,
+        'explanation_workers': 1,
+        'explanation_sample_per_cell': None,
+        'threshold': 13,
+        'top_k': 10,
+        'feedback_mining_backend': MiningBackend.ECLAT.value,
+        'hyperparameter_optimisation': True,
+        'hyperparameter_optimisation_target': HyperoptTarget.F1.value,
+        'hyperparameter_optimisation_epochs': 100,
+        'hyperparameter_optimisation_workers': 1,
+        'hyperparameter_optimisation_reuse_tolerance': None,
+        'retrain_repetitions': 10,
+        'retrain_workers': 1,
+        'seed': None
+    }
+
+
 def run_full_pipeline(CONF=None):
     logger.info('Hey there!')
     if CONF is None:
-        CONF = {  # This contains the configuration for the run
-            'data':
-                {
-                    'TRAIN_DATA': 'input_data/' + 'd1_train_explainability_0-38.xes',
-                    'VALIDATE_DATA': 'input_data/' + 'd1_validation_explainability_38-40.xes',
-                    'FEEDBACK_DATA': 'input_data/' + 'd1_test_explainability_40-50.xes',
-                    'TEST_DATA': 'input_data/' + 'd1_test2_explainability_50-60.xes',
-                    'OUTPUT_DATA': 'output_data',
-                },
-            'prefix_length': 5,
-            'padding': True,
-            'feature_selection': EncodingType.SIMPLE.value,
-            'labeling_type': LabelTypes.ATTRIBUTE_STRING.value,
-            'predictive_model': PredictionMethods.RANDOM_FOREST.value,
-            'explanator': ExplainerType.SHAP.value,
-            'threshold': 13,
-            'top_k': 10,
-            'hyperparameter_optimisation': True,
-            'hyperparameter_optimisation_target': HyperoptTarget.F1.value,
-            'hyperparameter_optimisation_epochs': 100
-        }
+        CONF = default_conf()
+    # the report only covers this run
+    RECORDER.clear()
 
+    results = run_stages(
+        PIPELINE_STAGES,
+        CONF,
+        checkpoint_dir=CONF['data'].get('CHECKPOINT_DATA'),
+        targets=['evaluate', 'feedback', 'retrain']
+    )
+    initial_result = results['evaluate']
+    feedback_10, stability = results['feedback']
+    feedback, returned_results = results['retrain']
+
+    logger.info('RESULT')
+    logger.info('INITIAL', initial_result)
+    logger.info('RETRAIN', returned_results)
+
+    RECORDER.write_report(os.path.join(CONF['data']['OUTPUT_DATA'], 'instrumentation.json'))
+    RECORDER.write_chrome_trace(os.path.join(CONF['data']['OUTPUT_DATA'], 'instrumentation.trace.json'))
+
+    logger.info('Done, cheers!')
+
+    return {'feedback_10': feedback_10, 'used_feedback': feedback, 'initial_result': initial_result,
+            'retrain_result': returned_results, 'feedback_stability': stability}
+
+
+def _data_files(CONF):
+    return [CONF['data'][name] for name in ['TRAIN_DATA', 'VALIDATE_DATA', 'FEEDBACK_DATA', 'TEST_DATA']]
+
+
+def load_stage(CONF):
     logger.debug('LOAD DATA')
-    train_log = get_log(filepath=CONF['data']['TRAIN_DATA'])
-    validate_log = get_log(filepath=CONF['data']['VALIDATE_DATA'])
-    feedback_log = get_log(filepath=CONF['data']['FEEDBACK_DATA'])
-    test_log = get_log(filepath=CONF['data']['TEST_DATA'])
+    return [get_log(filepath=filepath, cache_dir=CONF['data'].get('CACHE_DATA')) for filepath in _data_files(CONF)]
+
 
+def encode_stage(CONF, logs):
     logger.debug('ENCODE DATA')
-    encoder, train_df, validate_df, feedback_df, test_df = get_encoded_df(
+    train_log, validate_log, feedback_log, test_log = logs
+    return get_encoded_df(
         train_log=train_log,
         validate_log=validate_log,
         test_log=feedback_log,
@@ -71,35 +134,99 @@ def run_full_pipeline(CONF=None):
         CONF=CONF
     )
 
+
+def train_stage(CONF, encoded):
     logger.debug('TRAIN PREDICTIVE MODEL')
+    encoder, train_df, validate_df, feedback_df, test_df = encoded
     predictive_model = PredictiveModel(CONF['predictive_model'], train_df, validate_df)
 
     predictive_model.model, predictive_model.config = retrieve_best_model(
         predictive_model,
         CONF['predictive_model'],
         max_evaluations=CONF['hyperparameter_optimisation_epochs'],
-        target=CONF['hyperparameter_optimisation_target']
+        target=CONF['hyperparameter_optimisation_target'],
+        n_workers=CONF.get('hyperparameter_optimisation_workers', 1),
+        seed=CONF.get('seed'),
+        trial_store=CONF['data'].get('HYPEROPT_STORE')
     )
+    return predictive_model
+
+
+def compile_stage(CONF, encoded, predictive_model):
+    if not CONF.get('compiled_inference', False) or \
+            CONF['predictive_model'] != PredictionMethods.RANDOM_FOREST.value:
+        return predictive_model
+    logger.debug('COMPILE PREDICTIVE MODEL')
+    encoder, train_df, validate_df, feedback_df, test_df = encoded
+    # a copy, the trained model may be shared with the other stages
+    compiled_model = copy.copy(predictive_model)
+    compiled_model.model = compile_forest(predictive_model.model, model_input(drop_columns(validate_df)))
+    return compiled_model
 
+
+def evaluate_stage(CONF, encoded, predictive_model):
     logger.debug('EVALUATE PREDICTIVE MODEL')
-    predicted = predictive_model.model.predict(drop_columns(test_df))
-    scores = predictive_model.model.predict_proba(drop_columns(test_df))[:, 1]
+    encoder, train_df, validate_df, feedback_df, test_df = encoded
+    features = model_input(drop_columns(test_df))
+    predicted = predictive_model.model.predict(features)
+    scores = predictive_model.model.predict_proba(features)[:, 1]
     actual = test_df['label']
-    initial_result = evaluate(actual, predicted, scores)
+    return evaluate(actual, predicted, scores)
+
 
+def explain_stage(CONF, encoded, predictive_model):
     logger.debug('COMPUTE EXPLANATION')
-    explanations = explain(CONF['explanator'], predictive_model, feedback_df, encoder)
+    encoder, train_df, validate_df, feedback_df, test_df = encoded
+    explanation_store = None
+    if CONF['data'].get('EXPLANATION_STORE') is not None:
+        explanation_store = ExplanationStore(CONF['data']['EXPLANATION_STORE'])
+    explanations = explain(
+        CONF['explanator'],
+        predictive_model,
+        feedback_df,
+        encoder,
+        n_workers=CONF.get('explanation_workers', 1),
+        seed=CONF.get('seed'),
+        store=explanation_store,
+        sample_per_cell=CONF.get('explanation_sample_per_cell')
+    )
+    if explanation_store is not None:
+        logger.debug('explanation store: {} hits, {} misses'.format(explanation_store.hits, explanation_store.misses))
+    return explanations
 
+
+def feedback_stage(CONF, encoded, predictive_model, explanations):
     logger.debug('COMPUTE FEEDBACK')
+    encoder, train_df, validate_df, feedback_df, test_df = encoded
     feedback_10 = compute_feedback(
         explanations,
         predictive_model,
         feedback_df,
         encoder,
-        top_k=CONF['top_k']
+        top_k=CONF['top_k'],
+        mining_backend=CONF.get('feedback_mining_backend', MiningBackend.RELIM.value)
     )
+    stability = None
+    if CONF.get('explanation_sample_per_cell') is not None:
+        stability = feedback_stability(
+            explanations,
+            predictive_model,
+            feedback_df,
+            encoder,
+            top_k=CONF['top_k'],
+            seed=CONF.get('seed'),
+            mining_backend=CONF.get('feedback_mining_backend', MiningBackend.RELIM.value)
+        )
+        logger.info('FEEDBACK STABILITY {}'.format(stability))
+    return feedback_10, stability
+
 
+def retrain_stage(CONF, encoded, feedback_output):
     logger.debug('SHUFFLE FEATURES')
+    encoder, train_df, validate_df, feedback_df, test_df = encoded
+    feedback_10, _ = feedback_output
+    # decoded copies, the encoded frames may be shared with the other stages
+    train_df, validate_df = train_df.copy(), validate_df.copy()
     encoder.decode(train_df)
     encoder.decode(validate_df)
     returned_results = {}
@@ -107,48 +234,55 @@ def run_full_pipeline(CONF=None):
     for top_k_threshold in [1, 2]:
         feedback[top_k_threshold] = {classes: feedback_10[classes][:top_k_threshold] for classes in feedback_10}
 
-        retrain_results = []
-        for _ in range(10):
-
-            shuffled_train_df = randomise_features(feedback[top_k_threshold], train_df)
-            shuffled_validate_df = randomise_features(feedback[top_k_threshold], validate_df)
-            encoder.encode(shuffled_train_df)
-            encoder.encode(shuffled_validate_df)
-
-            logger.debug('RETRAIN-- TRAIN PREDICTIVE MODEL')
-            predictive_model = PredictiveModel(CONF['predictive_model'], shuffled_train_df, shuffled_validate_df)
-            try:
-                predictive_model.model, predictive_model.config = retrieve_best_model(
-                    predictive_model,
-                    CONF['predictive_model'],
-                    max_evaluations=CONF['hyperparameter_optimisation_epochs'],
-                    target=CONF['hyperparameter_optimisation_target']
-                )
-
-                logger.debug('RETRAIN-- EVALUATE PREDICTIVE MODEL')
-                predicted = predictive_model.model.predict(drop_columns(test_df))
-                scores = predictive_model.model.predict_proba(drop_columns(test_df))[:, 1]
-                actual = test_df['label']
-                retrain_results += [evaluate(actual, predicted, scores)]
-            except Exception as e:
-                pass
-
-        stats_retrain_results = dict_mean(retrain_results)
+        retrain_results, failed_repetitions = retrain_with_feedback(
+            feedback[top_k_threshold],
+            train_df,
+            validate_df,
+            test_df,
+            encoder,
+            CONF,
+            n_repetitions=CONF.get('retrain_repetitions', 10),
+            budget=CONF.get('retrain_workers', CONF.get('hyperparameter_optimisation_workers', 1)),
+            seed=CONF.get('seed')
+        )
+
+        stats_retrain_results = dict_mean(retrain_results, failed_repetitions)
         returned_results[top_k_threshold] = {
             'avg': stats_retrain_results['avg'],
             'min': stats_retrain_results['min'],
             'max': stats_retrain_results['max'],
             'stdev': stats_retrain_results['stdev'],
-            'retrain_results': retrain_results
+            'retrain_results': retrain_results,
+            'failed_repetitions': stats_retrain_results['failures']
         }
+    return feedback, returned_results
 
-    logger.info('RESULT')
-    logger.info('INITIAL', initial_result)
-    logger.info('RETRAIN', returned_results)
 
-    logger.info('Done, cheers!')
+_TRAINING_CONF = ['predictive_model', 'hyperparameter_optimisation_target', 'hyperparameter_optimisation_epochs',
+                  'hyperparameter_optimisation_workers', 'seed']
+
+def _store(name):
+    # a stage run with a store does not share its checkpoint with one run without it
+    return lambda CONF: CONF['data'].get(name)
+
 
-    return {'feedback_10': feedback_10, 'used_feedback': feedback, 'initial_result': initial_result, 'retrain_result': returned_results}
+PIPELINE_STAGES = [
+    Stage('load', load_stage,
+          fingerprint=lambda CONF: [cache_key(filepath) for filepath in _data_files(CONF)]),
+    Stage('encode', encode_stage, inputs=['load'],
+          conf_keys=['prefix_length', 'padding', 'feature_selection', 'declare_min_support', 'labeling_type']),
+    Stage('train', train_stage, inputs=['encode'], conf_keys=_TRAINING_CONF, fingerprint=_store('HYPEROPT_STORE')),
+    Stage('compile', compile_stage, inputs=['encode', 'train'], conf_keys=['compiled_inference']),
+    Stage('evaluate', evaluate_stage, inputs=['encode', 'compile']),
+    Stage('explain', explain_stage, inputs=['encode', 'compile'],
+          conf_keys=['explanator', 'explanation_sample_per_cell', 'seed'], fingerprint=_store('EXPLANATION_STORE')),
+    Stage('feedback', feedback_stage, inputs=['encode', 'compile', 'explain'],
+          conf_keys=['top_k', 'feedback_mining_backend', 'explanation_sample_per_cell', 'seed']),
+    Stage('retrain', retrain_stage, inputs=['encode', 'feedback'],
+          conf_keys=_TRAINING_CONF + ['retrain_repetitions', 'retrain_workers',
+                                       'hyperparameter_optimisation_reuse_tolerance'],
+          fingerprint=_store('HYPEROPT_STORE'))
+]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import logging
+
+from scripts.run_full_pipeline import default_conf, PIPELINE_STAGES
+from src.labeling.common import LabelTypes
+from src.pipeline.stages import run_stages
+from src.predictive_model.predictive_model import drop_columns
+from src.serving.prediction_service import PredictionService, serve_stdio, serve_tcp, TTL, MAX_BATCH_SIZE, \
+    MAX_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+def load_service(CONF, ttl=TTL, max_batch_size=MAX_BATCH_SIZE, max_delay=MAX_DELAY) -> PredictionService:
+    """PredictionService on the encoder and model of the pipeline, taken from its checkpoints when they are there"""
+    outputs = run_stages(
+        PIPELINE_STAGES, CONF, checkpoint_dir=CONF['data'].get('CHECKPOINT_DATA'), targets=['encode', 'compile'])
+    encoder, train_df = outputs['encode'][:2]
+    return PredictionService(
+        outputs['compile'].model,
+        encoder,
+        drop_columns(train_df).columns,
+        ttl=ttl,
+        max_batch_size=max_batch_size,
+        max_delay=max_delay
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serves next activity predictions for the events of running cases, as json lines')
+    parser.add_argument('--port', type=int, help='serves on this tcp port instead of stdin and stdout')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ttl', type=float, default=TTL, help='seconds after which an idle case is dropped')
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-delay', type=float, default=MAX_DELAY,
+                        help='seconds an event waits for others to be predicted with')
+    args = parser.parse_args()
+
+    CONF = default_conf()
+    CONF['labeling_type'] = LabelTypes.NEXT_ACTIVITY.value
+    CONF['compiled_inference'] = True
+    service = load_service(CONF, args.ttl, args.max_batch_size, args.max_delay)
+    if args.port is not None:
+        asyncio.run(serve_tcp(service, args.host, args.port))
+    else:
+        asyncio.run(serve_stdio(service))
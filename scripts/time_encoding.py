@@ -4,8 +4,8 @@ from enum import Enum
 from pandas import *
 
 from dateutil.parser import parse
-import dateparser
-import holidays
+
+from src.encoding.feature_encoder.time_features import date_features, duration_features
 
 
 duration_allowed_word = ['d', 'days', 'h', 'hours', 'm', 'minutes', 's', 'seconds', 'ms']
@@ -133,70 +133,21 @@ def parse_date(column: list) -> DataFrame:
     :param column: list of str, strings to parse into date
     :return:
     """
-    results_df = DataFrame(columns=['date_day', 'date_month', 'date_year', 'date_hours', 'date_minutes', 'date_seconds',
-                                    'date_special_occasion'])
-    country = ['AO', 'AR', 'AW', 'AU', 'AT', 'BD', 'BY', 'BE', 'BR', 'BG', 'BI', 'CA', 'CL', 'CO', 'HR', 'CW', 'CZ',
-               'DK', 'DJ', 'DO', 'EG', 'England', 'EE', 'ECB', 'FI', 'FR', 'GE', 'DE', 'GR', 'HN', 'HK', 'HU', 'IS',
-               'IN', 'IE', 'IsleOfMan', 'IL', 'IT', 'JM', 'JP', 'KE', 'KR', 'LV', 'LT', 'LU', 'MW', 'MX', 'MA', 'MZ',
-               'NL', 'NZ', 'NI', 'NG', 'NO', 'PY', 'PE', 'PL', 'PT', 'PTE', 'RO', 'RU', 'SA', 'Scotland', 'RS', 'SG',
-               'SK', 'SI', 'ZA', 'ES', 'SE', 'CH', 'TR', 'UA', 'AE', 'GB', 'US', 'VN', 'Wales']
-
-    for string in column:
-        date = dateparser.parse(string)  # Returns a datetime type
-        row = [date.day, date.month, date.year, date.hour, date.minute, date.second]
-
-        i = 0
-        special_occasion = False
-        while (not special_occasion) and i < len(country):
-            holiday = holidays.CountryHoliday(country[i])
-            if date.strftime("%m-%d-%Y") in holiday:
-                special_occasion = True
-            i += 1
-        row.append(special_occasion)
-
-        results_df.loc[0 if isnull(results_df.index.max()) else results_df.index.max()+1] = row
-
-    return results_df
+    return date_features(column)
 
 
 def parse_duration(column: list) -> DataFrame:
-    """Parses strings of column into datetime objects and returns a DataFrame
+    """Parses strings of column into durations and returns a DataFrame
 
     I assume that I receive the duration in one of the following format
     - number (milliseconds)
+    - 2d 9h 37m 46s, with or without spaces and with the units also written in full
 
     :param column:
     :return:
     """
-    results_df = DataFrame(columns=['date_days', 'date_hours', 'date_minutes', 'date_seconds'])
+    return duration_features(column)
 
-    for string in column:
-        tuples = format_string_duration_parse(string)
-        row = [0, 0, 0, 0]
-
-        if tuples[0][1] == duration_allowed_word[8]:  # tuples == 'ms'
-            seconds = int(int(tuples[0][0])/1000)
-            row[3] = seconds % 60  # not right, only for test
-            minutes = int(seconds / 60)
-            row[2] = minutes % 60  # not right, only for test
-            hours = int(minutes / 60)
-            row[2] = hours % 24  # not right, only for test
-            days = int(hours / 24)
-            row[1] = days
-        else:
-            for group in tuples:
-                if group[1] == duration_allowed_word[0] or group[1] == duration_allowed_word[1]:
-                    row[0] += int(group[0])
-                elif group[1] == duration_allowed_word[2] or group[1] == duration_allowed_word[3]:
-                    row[1] += int(group[0])
-                elif group[1] == duration_allowed_word[4] or group[1] == duration_allowed_word[5]:
-                    row[2] += int(group[0])
-                elif group[1] == duration_allowed_word[6] or group[1] == duration_allowed_word[7]:
-                    row[3] += int(group[0])
-
-        results_df.loc[0 if isnull(results_df.index.max()) else results_df.index.max()+1] = row  # append row
-
-    return results_df
-
-
-main()
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,10 @@ setup(
               'src.explanation.wrappers',
               'src.explanation.confusion_matrix_feedback',
               'src.predictive_model',
-              'src.hyperparameter_optimisation'],
+              'src.hyperparameter_optimisation',
+              'src.pipeline',
+              'src.instrumentation',
+              'src.serving'],
     install_requires=[
         'pymining',
         'logging',
@@ -23,9 +26,13 @@ setup(
         'shap',
         'lime',
         'numpy',
+        'scipy',
         'enum',
-        'hyperopt'
-        'pathlib'
+        'hyperopt',
+        'pathlib',
+        'pyarrow',
+        'holidays',
+        'dateparser'
     ],
     url='https://github.com/PDI-FBK/LRP_CMF_integration',
     license='',
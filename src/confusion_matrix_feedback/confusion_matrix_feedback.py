@@ -1,21 +1,79 @@
 import numpy as np
-from pymining import itemmining
+from pandas import DataFrame
 
+from src.confusion_matrix_feedback.pattern_mining import mine_frequent_itemsets, MiningBackend
 from src.encoding.data_encoder import PADDING_VALUE
-from src.predictive_model.predictive_model import drop_columns
+from src.instrumentation.common import instrumented
+from src.predictive_model.predictive_model import drop_columns, model_input
+
+
+@instrumented('compute_feedback', items=lambda feedback, explanations, *args, **kwargs: len(explanations))
+def compute_feedback(explanations, predictive_model, feedback_df, encoder, threshold=None, top_k=None,
+                     mining_backend=MiningBackend.RELIM.value, max_pattern_length=None, n_workers=1):
+    """Frequent patterns of the explanations of every class missing from the correctly predicted traces
+
+    The patterns are mined by mining_backend, with at most max_pattern_length items, on a pool of n_workers
+    processes when n_workers > 1.
+    """
+    confusion_matrix = feedback_confusion_matrix(predictive_model, feedback_df, encoder)
+
+    return _feedback_from_confusion_matrix(
+        confusion_matrix, explanations, threshold, top_k, mining_backend, max_pattern_length, n_workers)
+
+
+def feedback_stability(explanations, predictive_model, feedback_df, encoder, threshold=None, top_k=None,
+                       n_resamples=20, fraction=0.8, seed=None, mining_backend=MiningBackend.RELIM.value,
+                       max_pattern_length=None, n_workers=1) -> dict:
+    """Agreement of the feedback mined from explanations with the one mined from resamples of them
+
+    Every resample keeps a fraction of the explained traces, drawn without replacement. The agreement of a
+    class is the Jaccard index between its top_k patterns on the resample and on all the explanations, its
+    mean and min over the n_resamples are returned per class.
+    """
+    confusion_matrix = feedback_confusion_matrix(predictive_model, feedback_df, encoder)
+    feedback = _feedback_from_confusion_matrix(
+        confusion_matrix, explanations, threshold, top_k, mining_backend, max_pattern_length, n_workers)
+
+    random_state = np.random.RandomState(seed)
+    trace_ids = sorted(explanations)
+    agreements = {classes: [] for classes in feedback}
+    for _ in range(n_resamples):
+        resample = random_state.choice(trace_ids, size=max(1, int(len(trace_ids) * fraction)), replace=False)
+        resampled_feedback = _feedback_from_confusion_matrix(
+            confusion_matrix,
+            {trace_id: explanations[trace_id] for trace_id in resample},
+            threshold,
+            top_k,
+            mining_backend,
+            max_pattern_length,
+            n_workers
+        )
+        for classes in feedback:
+            agreements[classes] += [_patterns_agreement(feedback[classes], resampled_feedback[classes])]
+
+    return {
+        classes: {'mean': float(np.mean(agreements[classes])), 'min': float(np.min(agreements[classes]))}
+        for classes in agreements
+    }
 
 
-def compute_feedback(explanations, predictive_model, feedback_df, encoder, threshold=None, top_k=None):
-    predicted = predictive_model.model.predict(drop_columns(feedback_df))
+def feedback_confusion_matrix(predictive_model, feedback_df, encoder) -> dict:
+    """Trace ids of feedback_df in every (actual, predicted) cell of the confusion matrix of predictive_model"""
+    predicted = predictive_model.model.predict(model_input(drop_columns(feedback_df)))
     actual = feedback_df['label']
 
     trace_ids = feedback_df['trace_id']
 
-    confusion_matrix = _retrieve_confusion_matrix_ids(trace_ids, predicted=predicted, actual=actual, encoder=encoder)
+    return _retrieve_confusion_matrix_ids(trace_ids, predicted=predicted, actual=actual, encoder=encoder)
 
+
+def _feedback_from_confusion_matrix(confusion_matrix, explanations, threshold=None, top_k=None,
+                                    mining_backend=MiningBackend.RELIM.value, max_pattern_length=None,
+                                    n_workers=1) -> dict:
     filtered_explanations = _filter_explanations(explanations, threshold)
 
-    frequent_patterns = _mine_frequent_patterns(confusion_matrix, filtered_explanations)
+    frequent_patterns = _mine_frequent_patterns(
+        confusion_matrix, filtered_explanations, mining_backend, max_pattern_length, n_workers)
 
     feedback = {
         classes: _subtract_patterns(
@@ -37,6 +95,14 @@ def compute_feedback(explanations, predictive_model, feedback_df, encoder, thres
     return feedback
 
 
+def _patterns_agreement(patterns1, patterns2) -> float:
+    patterns1 = {tuple(tuple(item) for item in pattern) for pattern, _ in patterns1}
+    patterns2 = {tuple(tuple(item) for item in pattern) for pattern, _ in patterns2}
+    if not patterns1 and not patterns2:
+        return 1.
+    return len(patterns1 & patterns2) / len(patterns1 | patterns2)
+
+
 def _retrieve_confusion_matrix_ids(trace_ids, predicted, actual, encoder) -> dict:
     decoded_predicted = encoder.decode_column(predicted, 'label')
     decoded_actual = encoder.decode_column(actual, 'label')
@@ -44,20 +110,19 @@ def _retrieve_confusion_matrix_ids(trace_ids, predicted, actual, encoder) -> dic
         trace_ids,
         decoded_predicted,
         decoded_actual
-    )).tolist()
+    ))
 
     # matrix format is (actual, predicted)
-    confusion_matrix = {}
     classes = list(encoder.get_values('label')[0])
     if str(PADDING_VALUE) in classes: classes.remove(str(PADDING_VALUE))
-    for act in classes:
-        confusion_matrix[act] = {}
-        for pred in classes:
-            confusion_matrix[act][pred] = {
-                trace_id
-                for trace_id, predicted, actual in elements
-                if actual == act and predicted == pred
-            }
+    confusion_matrix = {act: {pred: set() for pred in classes} for act in classes}
+
+    # one grouping pass over the rows instead of one scan per (actual, predicted) pair
+    cells = DataFrame(elements, columns=['trace_id', 'predicted', 'actual']).groupby(
+        ['actual', 'predicted'], sort=False)['trace_id']
+    for (act, pred), cell_trace_ids in cells:
+        if act in confusion_matrix and pred in confusion_matrix[act]:
+            confusion_matrix[act][pred] = set(cell_trace_ids.tolist())
 
     return confusion_matrix
 
@@ -72,23 +137,37 @@ def _filter_explanations(explanations, threshold=None):
     }
 
 
-def _mine_frequent_patterns(confusion_matrix, filtered_explanations):
-    mined_patterns = {}
-    for actual in confusion_matrix:
-        mined_patterns[actual] = {}
-        for pred in confusion_matrix[actual]:
-            mined_patterns[actual][pred] = itemmining.relim(itemmining.get_relim_input([
+def _mine_frequent_patterns(confusion_matrix, filtered_explanations, mining_backend=MiningBackend.RELIM.value,
+                            max_pattern_length=None, n_workers=1):
+    mined = mine_frequent_itemsets(
+        {
+            (actual, pred): [
                 [
-                    str(feature_name) + '//' + str(value)  # + '_' + str(_tassellate_number(importance))
+                    (str(feature_name), str(value))  # + '_' + str(_tassellate_number(importance))
                     for feature_name, value, importance in filtered_explanations[tid]
                 ]
                 for tid in confusion_matrix[actual][pred]
                 if tid in filtered_explanations
-            ]), min_support=2)
+            ]
+            for actual in confusion_matrix
+            for pred in confusion_matrix[actual]
+        },
+        min_support=2,
+        backend=mining_backend,
+        max_length=max_pattern_length,
+        n_workers=n_workers
+    )
+
+    mined_patterns = {}
+    for actual in confusion_matrix:
+        mined_patterns[actual] = {}
+        for pred in confusion_matrix[actual]:
+            # sorted by itemset first, the stable sort by support keeps the ties in that order whatever backend
+            # mined them
             mined_patterns[actual][pred] = sorted(
                 [
-                    ([el.split('//') for el in list(key)], mined_patterns[actual][pred][key])
-                    for key in mined_patterns[actual][pred]
+                    ([list(item) for item in itemset], support)
+                    for itemset, support in sorted(mined[(actual, pred)].items())
                 ],
                 key=lambda x: x[1],
                 reverse=True
@@ -0,0 +1,165 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+
+import numpy as np
+
+
+class MiningBackend(Enum):
+    RELIM = 'relim'
+    ECLAT = 'eclat'
+
+
+_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int64)
+
+_WORKER_DATA = {}
+
+
+def mine_frequent_itemsets(cells: dict, min_support=2, backend=MiningBackend.RELIM.value, max_length=None,
+                           n_workers=1) -> dict:
+    """Frequent itemsets of the transactions of every cell, as {cell: {itemset: support}}
+
+    An itemset is the tuple of its items in sorted order, only the ones with at most max_length items are
+    returned. The items of all the cells are encoded as integers once, the cells are then mined one after
+    the other, or on a pool of n_workers processes when n_workers > 1. Both backends stop extending an itemset
+    once it has max_length items.
+    With the eclat backend every item is a bitset over the transactions of all the cells, and a cell is mined
+    by intersecting the byte range of the bitsets holding its transactions.
+    """
+    vocabulary = sorted(set(item for transactions in cells.values() for transaction in transactions
+                            for item in transaction))
+    codes = {item: code for code, item in enumerate(vocabulary)}
+    encoded = {
+        cell: [sorted(set(codes[item] for item in transaction)) for transaction in transactions]
+        for cell, transactions in cells.items()
+    }
+
+    if backend == MiningBackend.RELIM.value:
+        initargs = (min_support, max_length)
+        initializer = _init_relim_worker
+        jobs = list(encoded.values())
+        mine = _mine_relim
+    elif backend == MiningBackend.ECLAT.value:
+        item_bitsets, cell_ranges = _vertical_layout(list(encoded.values()), len(vocabulary))
+        initargs = (min_support, max_length, item_bitsets)
+        initializer = _init_eclat_worker
+        jobs = cell_ranges
+        mine = _mine_eclat
+    else:
+        raise Exception('unsupported mining backend')
+
+    if n_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=initializer, initargs=initargs) as executor:
+            mined = list(executor.map(mine, jobs))
+    else:
+        initializer(*initargs)
+        mined = [mine(job) for job in jobs]
+        _WORKER_DATA.clear()
+
+    return {
+        cell: {tuple(vocabulary[code] for code in itemset): support for itemset, support in itemsets.items()}
+        for cell, itemsets in zip(encoded, mined)
+    }
+
+
+def _vertical_layout(cells: list, n_items: int) -> tuple:
+    """Packed bitsets of the transactions holding every item, and the byte range of the transactions of every cell
+
+    The transactions of every cell are contiguous and start on a byte boundary, so the bitsets of a cell are a
+    slice of the ones of all the cells.
+    """
+    n_bytes = [(len(transactions) + 7) // 8 for transactions in cells]
+    byte_starts = np.cumsum([0] + n_bytes)
+    matrix = np.zeros((n_items, 8 * byte_starts[-1]), dtype=bool)
+    for cell, transactions in enumerate(cells):
+        for position, transaction in enumerate(transactions):
+            matrix[transaction, 8 * byte_starts[cell] + position] = True
+    return np.packbits(matrix, axis=1), list(zip(byte_starts[:-1].tolist(), byte_starts[1:].tolist()))
+
+
+def _init_relim_worker(min_support, max_length):
+    _WORKER_DATA['min_support'] = min_support
+    _WORKER_DATA['max_length'] = max_length
+
+
+def _mine_relim(transactions) -> dict:
+    itemsets = {}
+    _extend_relim((), Counter(tuple(transaction) for transaction in transactions), _WORKER_DATA['min_support'],
+                  _WORKER_DATA['max_length'], itemsets)
+    return itemsets
+
+
+def _extend_relim(prefix, transactions, min_support, max_length, itemsets):
+    """Recursive elimination of the items of transactions, a Counter of their sorted tuples, extending prefix
+
+    Every transaction is listed under its first frequent item. The items are eliminated in order, each one
+    reporting its support and mining the conditional database of the suffixes listed under it, which is only
+    built while the extended itemset is shorter than max_length, then moving them under their next item.
+    """
+    supports = Counter()
+    for transaction, weight in transactions.items():
+        for item in transaction:
+            supports[item] += weight
+    heads = {}
+    for transaction, weight in transactions.items():
+        frequent = tuple(item for item in transaction if supports[item] >= min_support)
+        if frequent:
+            suffixes = heads.setdefault(frequent[0], Counter())
+            suffixes[frequent[1:]] += weight
+    while heads:
+        item = min(heads)
+        suffixes = heads.pop(item)
+        itemset = prefix + (item,)
+        itemsets[itemset] = supports[item]
+        if max_length is None or len(itemset) < max_length:
+            conditional = Counter({suffix: weight for suffix, weight in suffixes.items() if suffix})
+            if conditional:
+                _extend_relim(itemset, conditional, min_support, max_length, itemsets)
+        for suffix, weight in suffixes.items():
+            if suffix:
+                heads.setdefault(suffix[0], Counter())[suffix[1:]] += weight
+
+
+def _init_eclat_worker(min_support, max_length, item_bitsets):
+    _WORKER_DATA['min_support'] = min_support
+    _WORKER_DATA['max_length'] = max_length
+    _WORKER_DATA['item_bitsets'] = item_bitsets
+
+
+def _mine_eclat(cell_range) -> dict:
+    start, end = cell_range
+    bitsets = _WORKER_DATA['item_bitsets'][:, start:end]
+    supports = _POPCOUNT[bitsets].sum(axis=1)
+    frequent = supports >= _WORKER_DATA['min_support']
+    itemsets = {}
+    _extend_eclat(
+        (),
+        np.flatnonzero(frequent),
+        bitsets[frequent],
+        supports[frequent],
+        _WORKER_DATA['min_support'],
+        _WORKER_DATA['max_length'],
+        itemsets
+    )
+    return itemsets
+
+
+def _extend_eclat(prefix, items, bitsets, supports, min_support, max_length, itemsets):
+    """Depth first extension of prefix with every item, each one only joined with the items after it"""
+    for index in range(len(items)):
+        itemset = prefix + (int(items[index]),)
+        itemsets[itemset] = int(supports[index])
+        if index + 1 < len(items) and (max_length is None or len(itemset) < max_length):
+            joined = bitsets[index + 1:] & bitsets[index]
+            joined_supports = _POPCOUNT[joined].sum(axis=1)
+            frequent = joined_supports >= min_support
+            if frequent.any():
+                _extend_eclat(
+                    itemset,
+                    items[index + 1:][frequent],
+                    joined[frequent],
+                    joined_supports[frequent],
+                    min_support,
+                    max_length,
+                    itemsets
+                )
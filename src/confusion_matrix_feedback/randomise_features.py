@@ -1,30 +1,49 @@
-import random
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
 
-from pandas import Series, DataFrame
+from src.instrumentation.common import instrumented
 
 
-def randomise_features(feedback, train_df) -> DataFrame:
+@instrumented('randomise_features', items=lambda randomised_df, *args, **kwargs: len(randomised_df))
+def randomise_features(feedback, train_df, rng: np.random.Generator = None) -> DataFrame:
+    """Copy of train_df where the columns of every feedback pattern are redrawn uniformly among their values
+
+    A pattern of a class redraws the rows of that class and the rows matching every value of the pattern. The
+    values of a pattern are strings, as mined from the explanations, they are matched against the string of
+    every value, so that the counts of the sparse columns match too.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
     randomised_df = train_df.copy()
 
     for classes in feedback:
         for single_feedback, _ in feedback[classes]:
             target_columns = [column_name for column_name, _ in single_feedback]
 
-            possible_values = {column: list(set(train_df[column].values)) for column in target_columns}
+            possible_values = {column: pd.unique(train_df[column].values) for column in target_columns}
+
+            mask = (randomised_df['label'] == classes).to_numpy()
+            matching = np.ones(len(randomised_df), dtype=bool)
+            for column, value in single_feedback:
+                matching &= _as_strings(randomised_df[column]) == str(value)
+            mask |= matching
 
-            randomised_df = randomised_df.apply(
-                lambda row:
-                    row if row['label'] != classes and any([row[column] != value for column, value in single_feedback])
-                    else Series({
-                        column:
-                            random.choice(possible_values[column]) if column in target_columns
-                            else value
-                        for column, value in row.iteritems()
-                    }),
-                axis=1
-            )
+            n_rows = int(mask.sum())
+            if n_rows == 0:
+                continue
+            for column in target_columns:
+                # rebuilt rather than assigned in place, sparse columns do not support item assignment
+                values = randomised_df[column].to_numpy(copy=True)
+                values[mask] = rng.choice(possible_values[column], size=n_rows)
+                randomised_df[column] = pd.Series(values, index=randomised_df.index).astype(
+                    randomised_df[column].dtype)
 
     randomised_df = randomised_df[train_df.columns]
 
     return randomised_df
 
+
+def _as_strings(column: pd.Series) -> np.ndarray:
+    # a sparse column is only made dense one column at a time
+    return np.asarray(column.to_numpy()).astype(str)
@@ -0,0 +1,133 @@
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.confusion_matrix_feedback.randomise_features import randomise_features
+from src.evaluation.common import evaluate
+from src.hyperparameter_optimisation.common import retrieve_best_model
+from src.hyperparameter_optimisation.trial_store import TrialStore
+from src.instrumentation.common import RECORDER
+from src.predictive_model.common import PredictionMethods
+from src.predictive_model.compiled_forest import compile_forest
+from src.predictive_model.predictive_model import PredictiveModel, drop_columns, model_input
+
+logger = logging.getLogger(__name__)
+
+_WORKER_DATA = {}
+
+
+def split_workers(budget: int, n_repetitions: int) -> tuple:
+    """Processes running repetitions and hyperopt workers of each of them, their product stays within budget"""
+    repetition_workers = max(1, min(budget, n_repetitions))
+    return repetition_workers, max(1, budget // repetition_workers)
+
+
+def retrain_with_feedback(feedback, train_df, validate_df, test_df, encoder, CONF, n_repetitions=10, budget=1,
+                          seed=None) -> tuple:
+    """Retrains and evaluates the model n_repetitions times on train_df and validate_df randomised by feedback
+
+    train_df and validate_df are the decoded frames, test_df the encoded one. The repetitions run on a pool of
+    processes sharing the budget of cores with their hyperopt searches, see split_workers. Every repetition
+    draws from its own seed, spawned from seed. Its search suggests hyperparameter_optimisation_workers
+    configurations at a time, however many processes the budget leaves it to evaluate them, and reads the trial
+    store without writing to it, so for a given seed the results do not depend on the budget.
+    Returns the evaluations of the repetitions that succeeded, in repetition order, and the failed ones with
+    their exception.
+    """
+    repetition_workers, model_workers = split_workers(budget, n_repetitions)
+    seeds = np.random.SeedSequence(seed).spawn(n_repetitions)
+    initargs = (feedback, train_df, validate_df, test_df, encoder, CONF, model_workers, seed is not None)
+
+    if repetition_workers > 1:
+        with ProcessPoolExecutor(max_workers=repetition_workers, initializer=_init_worker,
+                                 initargs=initargs) as executor:
+            outcomes = list(executor.map(_run_repetition, range(n_repetitions), seeds))
+        # the spans recorded by the workers are merged into the ones of this process
+        for outcome in outcomes:
+            RECORDER.extend(outcome['spans'])
+    else:
+        _init_worker(*initargs)
+        outcomes = [_run_repetition(repetition, repetition_seed)
+                    for repetition, repetition_seed in zip(range(n_repetitions), seeds)]
+        _WORKER_DATA.clear()
+
+    results = [outcome['result'] for outcome in outcomes if outcome['exception'] is None]
+    failures = [
+        {'repetition': outcome['repetition'], 'exception': outcome['exception']}
+        for outcome in outcomes
+        if outcome['exception'] is not None
+    ]
+    for failure in failures:
+        logger.warning('retrain repetition {repetition} failed: {exception}'.format(**failure))
+    return results, failures
+
+
+def _init_worker(feedback, train_df, validate_df, test_df, encoder, CONF, model_workers, seeded):
+    _WORKER_DATA['feedback'] = feedback
+    _WORKER_DATA['train_df'] = train_df
+    _WORKER_DATA['validate_df'] = validate_df
+    _WORKER_DATA['test_df'] = test_df
+    _WORKER_DATA['encoder'] = encoder
+    _WORKER_DATA['CONF'] = CONF
+    _WORKER_DATA['model_workers'] = model_workers
+    _WORKER_DATA['seeded'] = seeded
+
+
+def _run_repetition(repetition, seed_sequence) -> dict:
+    n_spans = len(RECORDER.spans)
+    try:
+        result = _retrain(
+            _WORKER_DATA['feedback'],
+            _WORKER_DATA['train_df'],
+            _WORKER_DATA['validate_df'],
+            _WORKER_DATA['test_df'],
+            _WORKER_DATA['encoder'],
+            _WORKER_DATA['CONF'],
+            _WORKER_DATA['model_workers'],
+            rng=np.random.default_rng(seed_sequence),
+            seed=int(seed_sequence.generate_state(1)[0] >> 1) if _WORKER_DATA['seeded'] else None
+        )
+        outcome = {'repetition': repetition, 'result': result, 'exception': None}
+    except Exception:
+        outcome = {'repetition': repetition, 'result': None, 'exception': traceback.format_exc()}
+    outcome['spans'] = RECORDER.spans[n_spans:]
+    return outcome
+
+
+def _retrain(feedback, train_df, validate_df, test_df, encoder, CONF, model_workers, rng, seed) -> dict:
+    shuffled_train_df = randomise_features(feedback, train_df, rng=rng)
+    shuffled_validate_df = randomise_features(feedback, validate_df, rng=rng)
+    encoder.encode(shuffled_train_df)
+    encoder.encode(shuffled_validate_df)
+
+    logger.debug('RETRAIN-- TRAIN PREDICTIVE MODEL')
+    predictive_model = PredictiveModel(CONF['predictive_model'], shuffled_train_df, shuffled_validate_df)
+    trial_store = None
+    if CONF['data'].get('HYPEROPT_STORE') is not None:
+        # read only, the repetitions running meanwhile all see the store as it was before them
+        trial_store = TrialStore(CONF['data']['HYPEROPT_STORE'], read_only=True)
+    predictive_model.model, predictive_model.config = retrieve_best_model(
+        predictive_model,
+        CONF['predictive_model'],
+        max_evaluations=CONF['hyperparameter_optimisation_epochs'],
+        target=CONF['hyperparameter_optimisation_target'],
+        n_workers=model_workers,
+        seed=seed,
+        trial_store=trial_store,
+        batch_size=CONF.get('hyperparameter_optimisation_workers', 1),
+        reuse_tolerance=CONF.get('hyperparameter_optimisation_reuse_tolerance')
+    )
+
+    if CONF.get('compiled_inference', False) and CONF['predictive_model'] == PredictionMethods.RANDOM_FOREST.value:
+        # the retrained models predict as the one of the pipeline, the compiled forest gives the same probabilities
+        predictive_model.model = compile_forest(
+            predictive_model.model, model_input(drop_columns(shuffled_validate_df)))
+
+    logger.debug('RETRAIN-- EVALUATE PREDICTIVE MODEL')
+    features = model_input(drop_columns(test_df))
+    predicted = predictive_model.model.predict(features)
+    scores = predictive_model.model.predict_proba(features)[:, 1]
+    actual = test_df['label']
+    return evaluate(actual, predicted, scores)
@@ -5,10 +5,13 @@ from pandas import DataFrame
 from pm4py.objects.log.log import EventLog
 
 from src.encoding.data_encoder import Encoder
-from src.encoding.feature_encoder.frequency_features import frequency_features
-from src.encoding.feature_encoder.simple_features import simple_features
-from src.encoding.feature_encoder.complex_features import complex_features
-from src.encoding.feature_encoder.declare_features.declare_features import declare_features
+from src.instrumentation.common import instrumented
+from src.encoding.feature_encoder.frequency_features import frequency_features, frequency_features_multiple_prefixes
+from src.encoding.feature_encoder.simple_features import simple_features, simple_features_multiple_prefixes
+from src.encoding.feature_encoder.complex_features import complex_features, complex_features_multiple_prefixes
+from src.encoding.feature_encoder.time_features import time_features, time_features_multiple_prefixes
+from src.encoding.feature_encoder.declare_features.declare_features import declare_features, \
+    declare_features_multiple_prefixes
 
 logger = logging.getLogger(__name__)
 
@@ -18,16 +21,34 @@ class EncodingType(Enum):
     FREQUENCY = 'frequency'
     COMPLEX = 'complex'
     DECLARE = 'declare'
+    TIME = 'time'
 
 
 TRACE_TO_DF = {
     EncodingType.SIMPLE.value : simple_features,
-    # EncodingType.FREQUENCY.value : frequency_features,
+    EncodingType.FREQUENCY.value : frequency_features,
     EncodingType.COMPLEX.value : complex_features,
-    # EncodingType.DECLARE.value : declare_features
+    EncodingType.TIME.value : time_features,
+    EncodingType.DECLARE.value : declare_features
 }
 
+TRACE_TO_DFS = {
+    EncodingType.SIMPLE.value : simple_features_multiple_prefixes,
+    EncodingType.FREQUENCY.value : frequency_features_multiple_prefixes,
+    EncodingType.COMPLEX.value : complex_features_multiple_prefixes,
+    EncodingType.TIME.value : time_features_multiple_prefixes,
+    EncodingType.DECLARE.value : declare_features_multiple_prefixes,
+}
+
+
+def _encoding_options(CONF: dict) -> dict:
+    """Options of the selected encoding besides the shared ones, they only shape the features of the train log"""
+    if CONF['feature_selection'] == EncodingType.DECLARE.value:
+        return {'min_support': CONF.get('declare_min_support')}
+    return {}
+
 
+@instrumented('get_encoded_df', items=lambda encoded, *args, **kwargs: sum(len(df) for df in encoded[1:]))
 def get_encoded_df(train_log: EventLog, validate_log: EventLog, test_log: EventLog, retrain_test_log: EventLog, CONF: dict=None) -> (DataFrame, DataFrame, DataFrame):
     logger.debug('SELECT FEATURES')
     train_df = TRACE_TO_DF[CONF['feature_selection']](
@@ -35,7 +56,8 @@ def get_encoded_df(train_log: EventLog, validate_log: EventLog, test_log: EventL
         prefix_length=CONF['prefix_length'],
         padding=CONF['padding'],
         labeling_type=CONF['labeling_type'],
-        feature_list=None
+        feature_list=None,
+        **_encoding_options(CONF)
     )
     validate_df = TRACE_TO_DF[CONF['feature_selection']](
         validate_log,
@@ -68,3 +90,48 @@ def get_encoded_df(train_log: EventLog, validate_log: EventLog, test_log: EventL
     encoder.encode(df=retrain_test_df)
 
     return encoder, train_df, validate_df, test_df, retrain_test_df
+
+
+def get_encoded_dfs(train_log: EventLog, validate_log: EventLog, test_log: EventLog, retrain_test_log: EventLog,
+                    prefix_lengths: list, CONF: dict=None) -> dict:
+    """get_encoded_df for every prefix length in prefix_lengths, each log is walked once for all of them
+
+    Returns a dict mapping each prefix length to its (encoder, train_df, validate_df, test_df, retrain_test_df).
+    """
+    logger.debug('SELECT FEATURES')
+    train_dfs = TRACE_TO_DFS[CONF['feature_selection']](
+        train_log,
+        prefix_lengths=prefix_lengths,
+        padding=CONF['padding'],
+        labeling_type=CONF['labeling_type'],
+        feature_lists=None,
+        **_encoding_options(CONF)
+    )
+    feature_lists = {prefix_length: train_dfs[prefix_length].columns for prefix_length in prefix_lengths}
+    validate_dfs, test_dfs, retrain_test_dfs = [
+        TRACE_TO_DFS[CONF['feature_selection']](
+            log,
+            prefix_lengths=prefix_lengths,
+            padding=CONF['padding'],
+            labeling_type=CONF['labeling_type'],
+            feature_lists=feature_lists
+        )
+        for log in [validate_log, test_log, retrain_test_log]
+    ]
+
+    encoded = {}
+    for prefix_length in prefix_lengths:
+        logger.debug('INITIALISE ENCODER')
+        encoder = Encoder(df=train_dfs[prefix_length])
+
+        logger.debug('ENCODE')
+        encoder.encode(df=train_dfs[prefix_length])
+        encoder.encode(df=validate_dfs[prefix_length])
+        encoder.encode(df=test_dfs[prefix_length])
+        encoder.encode(df=retrain_test_dfs[prefix_length])
+
+        encoded[prefix_length] = (
+            encoder, train_dfs[prefix_length], validate_dfs[prefix_length], test_dfs[prefix_length],
+            retrain_test_dfs[prefix_length]
+        )
+    return encoded
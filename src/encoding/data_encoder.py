@@ -1,7 +1,9 @@
+import math
+import numbers
+
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from sklearn.preprocessing import LabelEncoder
 
 PADDING_VALUE = 0
 
@@ -9,44 +11,114 @@ PADDING_VALUE = 0
 class Encoder:
     def __init__(self, df: DataFrame = None):
         self._encoder = {}
-        self._label_dict = {}
-        self._label_dict_decoder = {}
         for column in df:
-            if column != 'trace_id':
+            if column != 'trace_id' and not isinstance(df[column].dtype, pd.SparseDtype):
+                # sparse columns hold counts, they are fed to the models as they are
                 if df[column].dtype != int or (df[column].dtype == int and np.any(df[column] < 0)):
-                    self._encoder[column] = LabelEncoder().fit(
-                        sorted(pd.concat([pd.Series([str(PADDING_VALUE)]), df[column].apply(lambda x: str(x))])))
-                    classes = self._encoder[column].classes_
-                    transforms = self._encoder[column].transform(classes)
-                    self._label_dict[column] = dict(zip(classes, transforms))
-                    self._label_dict_decoder[column] = dict(zip(transforms, classes))
+                    # sorted vocabulary of the string representations, a value is encoded with its position
+                    self._encoder[column] = np.array(
+                        sorted(set(df[column].astype(str)) | {str(PADDING_VALUE)}), dtype=object)
+
+        self._offsets = {}
+        offset = 0
+        for column, classes in self._encoder.items():
+            self._offsets[column] = offset
+            offset += len(classes)
+        # every vocabulary laid out back to back, so that codes of several columns are decoded in one lookup
+        self._all_classes = np.concatenate([np.array([], dtype=object)] + list(self._encoder.values()))
 
     def encode(self, df: DataFrame) -> None:
         for column in df:
             if column in self._encoder:
-                df[column] = df[column].apply(lambda x: self._label_dict[column].get(str(x), PADDING_VALUE))
+                codes = pd.Categorical(df[column].astype(str), categories=self._encoder[column]).codes
+                df[column] = np.where(codes == -1, PADDING_VALUE, codes).astype(int)
 
     def decode(self, df: DataFrame) -> None:
         for column in df:
             if column in self._encoder:
-                df[column] = df[column].apply(lambda x: self._label_dict_decoder[column].get(x, PADDING_VALUE))
+                df[column] = pd.Series(self._decode(column, df[column].to_numpy()), index=df.index).infer_objects()
 
     def decode_row(self, row) -> np.array:
-        decoded_row = []
-        for column, value in row.iteritems():
-            if column in self._encoder:
-                decoded_row += [self._label_dict_decoder[column].get(value, PADDING_VALUE)]
-            else:
-                decoded_row += [value]
-        return np.array(decoded_row)
+        columns = list(row.index)
+        values = row.to_numpy(dtype=object).copy()
+        encoded = np.array([column in self._encoder for column in columns], dtype=bool)
+        if encoded.any():
+            encoded_columns = [column for column, is_encoded in zip(columns, encoded) if is_encoded]
+            values[encoded] = self._lookup(
+                np.array([self._offsets[column] for column in encoded_columns]),
+                np.array([len(self._encoder[column]) for column in encoded_columns]),
+                values[encoded]
+            )
+        return np.array(values.tolist())
+
+    def decode_rows(self, df: DataFrame) -> 'DecodedRows':
+        """Decoded values of df, its i-th element holds what decode_row returns for the i-th row"""
+        return DecodedRows(self, df)
 
     def decode_column(self, column, column_name) -> np.array:
-        decoded_column = []
         if column_name in self._encoder:
-            decoded_column += [ self._label_dict_decoder[column_name].get(x, PADDING_VALUE) for x in column]
-        else:
-            decoded_column += list(column)
-        return np.array(decoded_column)
+            if not isinstance(column, (np.ndarray, pd.Series)):
+                column = pd.Series(list(column))
+            return np.array(self._decode(column_name, np.asarray(column)).tolist())
+        return np.array(list(column))
+
+    def is_encoded(self, column_name) -> bool:
+        return column_name in self._encoder
 
     def get_values(self, column_name):
-        return (self._label_dict[column_name].keys(), self._label_dict_decoder[column_name].keys())
+        classes = self._encoder[column_name]
+        return classes.tolist(), list(range(len(classes)))
+
+    def _decode(self, column_name, codes: np.ndarray) -> np.ndarray:
+        return self._lookup(self._offsets[column_name], len(self._encoder[column_name]), codes)
+
+    def _lookup(self, offsets, sizes, codes: np.ndarray) -> np.ndarray:
+        """Decodes codes against the vocabularies starting at offsets, invalid codes become PADDING_VALUE"""
+        codes = _as_codes(codes)
+        valid = (codes >= 0) & (codes < sizes)
+        decoded = np.full(codes.shape, PADDING_VALUE, dtype=object)
+        decoded[valid] = self._all_classes[(codes + offsets)[valid]]
+        return decoded
+
+
+class DecodedRows:
+    """Rows of the decoded values of a frame, each one assembled when it is read
+
+    Only the columns with a vocabulary are decoded, the sparse columns stay a CSR matrix and a row reads its
+    values from it, so a sparse encoding is never made dense as a whole.
+    """
+
+    def __init__(self, encoder: Encoder, df: DataFrame):
+        is_sparse = np.array([isinstance(dtype, pd.SparseDtype) for dtype in df.dtypes], dtype=bool)
+        self._n_rows, self._n_columns = df.shape
+        self._dense_positions = np.flatnonzero(~is_sparse)
+        self._sparse_positions = np.flatnonzero(is_sparse)
+        dense_columns = [df.columns[position] for position in self._dense_positions]
+        self._dense = np.empty((self._n_rows, len(dense_columns)), dtype=object)
+        for index, column in enumerate(dense_columns):
+            values = df.iloc[:, self._dense_positions[index]].to_numpy()
+            self._dense[:, index] = encoder._decode(column, values) if encoder.is_encoded(column) else values
+        self._sparse = df.iloc[:, self._sparse_positions].sparse.to_coo().tocsr() if is_sparse.any() else None
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        row = np.empty(self._n_columns, dtype=object)
+        row[self._dense_positions] = self._dense[index]
+        if self._sparse is not None:
+            row[self._sparse_positions] = self._sparse.getrow(index).toarray()[0]
+        return row
+
+
+def _as_codes(values: np.ndarray) -> np.ndarray:
+    """Integer view of values, anything that is not an integral number becomes -1"""
+    if values.dtype.kind in 'biu':
+        return values.astype(np.int64)
+    if values.dtype.kind == 'f':
+        integral = np.isfinite(values) & (np.floor(values) == values)
+        return np.where(integral, np.nan_to_num(values), -1).astype(np.int64)
+    return np.array([
+        int(value) if isinstance(value, numbers.Real) and math.isfinite(value) and value == int(value) else -1
+        for value in values
+    ], dtype=np.int64)
@@ -1,8 +1,10 @@
-from functools import reduce
+from itertools import chain
+from operator import attrgetter
 
 from pandas import DataFrame
 from pm4py.objects.log.log import Trace, EventLog
 
+from src.encoding.feature_encoder.event_table import encode_prefixes, encode_multiple_prefixes
 from src.labeling.common import add_label_column
 
 ATTRIBUTE_CLASSIFIER = None
@@ -12,19 +14,43 @@ PREFIX_ = 'prefix_'
 
 def complex_features(log: EventLog, prefix_length, padding, labeling_type, feature_list: list = None) -> DataFrame:
     columns, additional_columns = _columns_complex(log, prefix_length, feature_list)
-    encoded_data = []
-    for trace in log:
-        if len(trace) <= prefix_length - 1 and not padding:
-            # trace too short and no zero padding
-            continue
-        encoded_data.append(_trace_to_row(trace, prefix_length, additional_columns, padding, columns, labeling_type))
-
-    return DataFrame(columns=columns, data=encoded_data)
+    return encode_prefixes(
+        log,
+        prefix_length,
+        padding,
+        labeling_type,
+        columns,
+        event_attributes=additional_columns['event_attributes'],
+        trace_attributes=additional_columns['trace_attributes']
+    )
+
+
+def complex_features_multiple_prefixes(log: EventLog, prefix_lengths: list, padding, labeling_type,
+                                       feature_lists: dict = None) -> dict:
+    """complex_features for every prefix length in prefix_lengths, all of them encoded in one walk of the log"""
+    additional_columns = _compute_additional_columns(log)
+    columns = {
+        prefix_length: _additional_columns_to_columns(
+            additional_columns,
+            prefix_length,
+            feature_lists[prefix_length] if feature_lists is not None else None
+        )
+        for prefix_length in prefix_lengths
+    }
+    return encode_multiple_prefixes(
+        log,
+        prefix_lengths,
+        padding,
+        labeling_type,
+        columns,
+        event_attributes=additional_columns['event_attributes'],
+        trace_attributes=additional_columns['trace_attributes']
+    )
 
 
 def _get_global_trace_attributes(log: EventLog):
     # retrieves all traces in the log and returns their intersection
-    attributes = list(reduce(set.union, [set(trace._get_attributes().keys()) for trace in log]))
+    attributes = list(set(chain.from_iterable(trace._get_attributes().keys() for trace in log)))
     trace_attributes = [attr for attr in attributes if attr not in ["concept:name", "time:timestamp", "label"]]
     return sorted(trace_attributes)
 
@@ -33,7 +59,7 @@ def _get_global_event_attributes(log):
     """Get log event attributes that are not name or time
     """
     # retrieves all events in the log and returns their intersection
-    attributes = list(reduce(set.union, [set(event._dict.keys()) for trace in log for event in trace]))
+    attributes = list(set(chain.from_iterable(map(attrgetter('_dict'), chain.from_iterable(log)))))
     event_attributes = [attr for attr in attributes if attr not in ["concept:name", "time:timestamp"]]
     return sorted(event_attributes)
 
@@ -45,6 +71,10 @@ def _compute_additional_columns(log) -> dict:
 
 def _columns_complex(log, prefix_length: int, feature_list: list = None) -> tuple:
     additional_columns = _compute_additional_columns(log)
+    return _additional_columns_to_columns(additional_columns, prefix_length, feature_list), additional_columns
+
+
+def _additional_columns_to_columns(additional_columns: dict, prefix_length: int, feature_list: list = None) -> list:
     columns = ['trace_id']
     columns += additional_columns['trace_attributes']
     for i in range(1, prefix_length + 1):
@@ -54,7 +84,7 @@ def _columns_complex(log, prefix_length: int, feature_list: list = None) -> tupl
     columns += ['label']
     if feature_list is not None:
         assert(list(feature_list) == columns)
-    return columns, additional_columns
+    return columns
 
 
 def _data_complex(trace: Trace, prefix_length: int, additional_columns: dict) -> list:
@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pm4py.objects.log.log import EventLog
+
+from src.encoding.feature_encoder.event_table import flatten_log, event_positions
+
+UNARY_TEMPLATES = ['existence', 'absence2', 'exactly1', 'init']
+BINARY_TEMPLATES = ['responded_existence', 'co_existence', 'response', 'precedence', 'succession',
+                    'chain_response', 'chain_precedence']
+
+SATISFIED = 1
+VACUOUS = 0
+VIOLATED = -1
+
+_WORD_BITS = 64
+
+
+def declare_features(log: EventLog, prefix_length, padding, labeling_type, feature_list: list = None,
+                     min_support: float = None) -> DataFrame:
+    return declare_features_multiple_prefixes(
+        log,
+        [prefix_length],
+        padding,
+        labeling_type,
+        {prefix_length: feature_list} if feature_list is not None else None,
+        min_support
+    )[prefix_length]
+
+
+def declare_features_multiple_prefixes(log: EventLog, prefix_lengths: list, padding, labeling_type,
+                                       feature_lists: dict = None, min_support: float = None) -> dict:
+    """DECLARE constraints of the prefixes of every trace, laid out as [trace_id, constraints, label]
+
+    A constraint is a template of UNARY_TEMPLATES over an activity, named 'template(a)', or of
+    BINARY_TEMPLATES over a pair of distinct activities, named 'template(a,b)'. Its value is SATISFIED,
+    VIOLATED or, for the binary ones that the prefix does not activate, VACUOUS.
+    The constraints are the ones in feature_lists when given, otherwise every one over the activities of log,
+    keeping with min_support only those satisfied by at least that fraction of the prefixes.
+    """
+    flat = flatten_log(log, prefix_lengths, padding, labeling_type, ['concept:name'])
+    trace_index, position = event_positions(flat['lengths'])
+    activities = flat['events'][:, 0].astype(str)
+
+    encoded = {}
+    for prefix_length in prefix_lengths:
+        in_prefix = position < prefix_length
+        kept = flat['kept'][prefix_length]
+        if feature_lists is not None:
+            columns = [column for column in feature_lists[prefix_length] if column not in ['trace_id', 'label']]
+            vocabulary = sorted(set(activities[in_prefix]))
+            constraints = [_parse_column(column, set(vocabulary)) for column in columns]
+            vocabulary = sorted(set(vocabulary) | {
+                activity for _, first, second in constraints for activity in [first, second] if activity is not None
+            })
+        else:
+            vocabulary = sorted(set(activities[in_prefix]))
+            constraints = None
+
+        positions = _ActivityPositions(
+            trace_index[in_prefix],
+            pd.Categorical(activities[in_prefix], categories=vocabulary).codes,
+            position[in_prefix],
+            len(flat['trace_ids']),
+            len(vocabulary),
+            prefix_length
+        )
+        if constraints is not None:
+            names, values = _evaluate_constraints(positions, vocabulary, constraints, kept)
+        else:
+            names, values = _evaluate_supported(positions, vocabulary, kept, min_support)
+
+        encoded[prefix_length] = pd.concat([
+            DataFrame({'trace_id': np.array(flat['trace_ids'], dtype=object)[kept]}),
+            DataFrame(values, columns=names),
+            DataFrame({'label': flat['labels'][prefix_length]})
+        ], axis=1)
+    return encoded
+
+
+class _ActivityPositions:
+    """Occurrences of every activity in every trace prefix, as counts, first and last positions and bitsets
+
+    bitsets[t, a] holds the positions of a in the prefix of trace t, position i being bit i % 64 of word
+    i // 64. There is always a word more than the prefix needs, so a bit shifted past its end is not lost.
+    """
+
+    def __init__(self, trace_index, codes, position, n_traces, n_activities, prefix_length):
+        n_words = prefix_length // _WORD_BITS + 1
+        self.counts = np.zeros((n_traces, n_activities), dtype=np.int64)
+        self.first = np.full((n_traces, n_activities), prefix_length, dtype=np.int64)
+        self.last = np.full((n_traces, n_activities), -1, dtype=np.int64)
+        self.bitsets = np.zeros((n_traces, n_activities, n_words), dtype=np.uint64)
+
+        np.add.at(self.counts, (trace_index, codes), 1)
+        np.minimum.at(self.first, (trace_index, codes), position)
+        np.maximum.at(self.last, (trace_index, codes), position)
+        np.bitwise_or.at(
+            self.bitsets,
+            (trace_index, codes, position // _WORD_BITS),
+            np.left_shift(np.uint64(1), (position % _WORD_BITS).astype(np.uint64))
+        )
+        self.present = self.counts > 0
+        # bitsets of the positions right before each occurrence, the ones at position 0 have none
+        self.preceding = _shift_right(self.bitsets)
+        self.starts = (self.bitsets[:, :, 0] & np.uint64(1)) != 0
+
+
+def _shift_left(bitsets: np.ndarray) -> np.ndarray:
+    """Every position moved one step later, across the words of the last axis"""
+    shifted = bitsets << np.uint64(1)
+    shifted[..., 1:] |= bitsets[..., :-1] >> np.uint64(_WORD_BITS - 1)
+    return shifted
+
+
+def _shift_right(bitsets: np.ndarray) -> np.ndarray:
+    """Every position moved one step earlier, across the words of the last axis, position 0 is dropped"""
+    shifted = bitsets >> np.uint64(1)
+    shifted[..., :-1] |= bitsets[..., 1:] << np.uint64(_WORD_BITS - 1)
+    return shifted
+
+
+def _outcome(activated: np.ndarray, satisfied: np.ndarray) -> np.ndarray:
+    return np.where(activated, np.where(satisfied, SATISFIED, VIOLATED), VACUOUS).astype(np.int8)
+
+
+def _unary_values(positions: _ActivityPositions) -> dict:
+    """Value of every unary template for every (trace, activity)"""
+    everywhere = np.ones_like(positions.present)
+    return {
+        'existence': _outcome(everywhere, positions.present),
+        'absence2': _outcome(everywhere, positions.counts < 2),
+        'exactly1': _outcome(everywhere, positions.counts == 1),
+        'init': _outcome(everywhere, positions.first == 0)
+    }
+
+
+def _binary_values(positions: _ActivityPositions, first: int) -> dict:
+    """Value of every binary template for every (trace, second activity), first being the first activity
+
+    The chain templates compare the bitsets of the pair word by word: an occurrence of first not followed by
+    second leaves a bit in the shifted bitset of first that the one of second does not clear.
+    """
+    first_present = positions.present[:, first, None]
+    second_present = positions.present
+    response = first_present & second_present & (positions.last[:, first, None] < positions.last)
+    precedence = first_present & second_present & (positions.first[:, first, None] < positions.first)
+
+    followed = _shift_left(positions.bitsets[:, first, :])
+    chain_response = ~np.any(followed[:, None, :] & ~positions.bitsets, axis=2)
+    chain_precedence = ~np.any(positions.preceding & ~positions.bitsets[:, first, None, :], axis=2) & \
+        ~positions.starts
+
+    either_present = first_present | second_present
+    return {
+        'responded_existence': _outcome(first_present, second_present),
+        'co_existence': _outcome(either_present, first_present & second_present),
+        'response': _outcome(first_present, response),
+        'precedence': _outcome(second_present, precedence),
+        'succession': _outcome(either_present, (~first_present | response) & (~second_present | precedence)),
+        'chain_response': _outcome(first_present, chain_response),
+        'chain_precedence': _outcome(second_present, chain_precedence)
+    }
+
+
+def _evaluate_constraints(positions: _ActivityPositions, vocabulary: list, constraints: list,
+                          kept: np.ndarray) -> tuple:
+    """Names and int8 matrix of the values of constraints, the binary ones evaluated once per first activity"""
+    index = {activity: code for code, activity in enumerate(vocabulary)}
+    by_first = {}
+    for column, (template, first, second) in enumerate(constraints):
+        by_first.setdefault(index[first], []).append(
+            (column, template, None if second is None else index[second]))
+
+    unary = _unary_values(positions)
+    values = np.empty((len(kept), len(constraints)), dtype=np.int8)
+    for first, columns in by_first.items():
+        binary = _binary_values(positions, first) if any(second is not None for _, _, second in columns) else {}
+        for column, template, second in columns:
+            if second is None:
+                values[:, column] = unary[template][kept, first]
+            else:
+                values[:, column] = binary[template][kept, second]
+    return [_column_name(*constraint) for constraint in constraints], values
+
+
+def _evaluate_supported(positions: _ActivityPositions, vocabulary: list, kept: np.ndarray,
+                        min_support: float) -> tuple:
+    """Names and int8 matrix of the values of every constraint over vocabulary satisfied often enough
+
+    The binary templates are evaluated one first activity at a time, against every second activity at once,
+    and the pruned columns are dropped right away, so the values of all the pairs are never held together.
+    """
+    names, columns = [], []
+
+    def keep(name, values):
+        values = values[kept]
+        if min_support is None or np.mean(values == SATISFIED) >= min_support:
+            names.append(name)
+            columns.append(values)
+
+    unary = _unary_values(positions)
+    for template in UNARY_TEMPLATES:
+        for code, activity in enumerate(vocabulary):
+            keep(_column_name(template, activity, None), unary[template][:, code])
+    for first, first_activity in enumerate(vocabulary):
+        binary = _binary_values(positions, first)
+        for template in BINARY_TEMPLATES:
+            for second, second_activity in enumerate(vocabulary):
+                if second != first:
+                    keep(_column_name(template, first_activity, second_activity), binary[template][:, second])
+
+    values = np.column_stack(columns) if columns else np.empty((len(kept), 0), dtype=np.int8)
+    return names, values
+
+
+def _column_name(template: str, first: str, second: str) -> str:
+    if second is None:
+        return '{}({})'.format(template, first)
+    return '{}({},{})'.format(template, first, second)
+
+
+def _parse_column(column: str, activities: set) -> tuple:
+    """(template, first activity, second activity or None) of a column named by _column_name
+
+    As activities may hold commas, the arguments of a binary template are split at the comma leaving the most
+    halves among activities, the first such comma on ties.
+    """
+    template = column[:column.index('(')]
+    arguments = column[len(template) + 1:-1]
+    if template in UNARY_TEMPLATES:
+        return template, arguments, None
+    if template not in BINARY_TEMPLATES:
+        raise Exception('unsupported declare template {}'.format(template))
+    commas = [index for index, character in enumerate(arguments) if character == ',']
+    split = max(commas, key=lambda index: (
+        (arguments[:index] in activities) + (arguments[index + 1:] in activities), -index
+    ))
+    return template, arguments[:split], arguments[split + 1:]
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pm4py.objects.log.log import EventLog
+
+from src.labeling.common import add_label_column
+
+PADDING_VALUE = 0
+MISSING_EVENT_ATTRIBUTE = '0'
+MISSING_TRACE_ATTRIBUTE = 0
+
+
+def flatten_log(log: EventLog, prefix_lengths: list, padding: bool, labeling_type: str,
+                event_columns: list, trace_attributes: list = ()) -> dict:
+    """Single pass over the log collecting the traces and a flat table of their first max(prefix_lengths) events
+
+    Traces shorter than every prefix length are skipped if padding is not set, 'kept' holds for each
+    prefix length the indexes of the collected traces it keeps and 'labels' their labels.
+    """
+    max_prefix_length = max(prefix_lengths)
+    trace_ids, trace_lengths, lengths, trace_values, events = [], [], [], [], []
+    labels = {prefix_length: [] for prefix_length in prefix_lengths}
+    for trace in log:
+        if len(trace) <= min(prefix_lengths) - 1 and not padding:
+            # trace too short and no zero padding
+            continue
+        attributes = trace.attributes
+        trace_ids.append(attributes['concept:name'])
+        trace_lengths.append(len(trace))
+        for prefix_length in prefix_lengths:
+            labels[prefix_length].append(add_label_column(trace, labeling_type, prefix_length))
+        if trace_attributes:
+            trace_values.append([attributes.get(att, MISSING_TRACE_ATTRIBUTE) for att in trace_attributes])
+        prefix = trace[:max_prefix_length]
+        lengths.append(len(prefix))
+        events += [event._dict for event in prefix]
+
+    trace_lengths = np.array(trace_lengths, dtype=int)
+    kept = {
+        prefix_length: np.arange(len(trace_ids)) if padding else np.flatnonzero(trace_lengths >= prefix_length)
+        for prefix_length in prefix_lengths
+    }
+    return {
+        'trace_ids': trace_ids,
+        'kept': kept,
+        'labels': {
+            prefix_length: _to_object_array(labels[prefix_length])[kept[prefix_length]]
+            for prefix_length in prefix_lengths
+        },
+        'lengths': np.array(lengths, dtype=int),
+        'trace_attributes': _to_object_matrix(trace_values, len(trace_ids), len(trace_attributes)),
+        'events': _event_matrix(events, event_columns)
+    }
+
+
+def _to_object_array(values: list) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _to_object_matrix(rows: list, n_rows: int, n_columns: int) -> np.ndarray:
+    matrix = np.empty((n_rows, n_columns), dtype=object)
+    for idx, row in enumerate(rows):
+        matrix[idx, :] = row
+    return matrix
+
+
+def _event_matrix(events: list, event_columns: list) -> np.ndarray:
+    """Object matrix of the event_columns of events, keeping the original python values
+
+    Attributes missing from an event are MISSING_EVENT_ATTRIBUTE, attributes actually set to nan stay nan.
+    """
+    matrix = np.empty((len(events), len(event_columns)), dtype=object)
+    for index, column in enumerate(event_columns):
+        matrix[:, index] = [event.get(column, MISSING_EVENT_ATTRIBUTE) for event in events]
+    return matrix
+
+
+def _typed_column(values: np.ndarray) -> np.ndarray:
+    """values as a numeric array when all of them are numbers, padding them with PADDING_VALUE keeps the type"""
+    inferred = pd.Series(values, dtype=object).infer_objects().to_numpy()
+    return inferred if inferred.dtype.kind in 'iuf' else values
+
+
+def event_positions(lengths: np.ndarray) -> tuple:
+    """Trace index and position in the trace of every row of the flat event table"""
+    trace_index = np.repeat(np.arange(len(lengths)), lengths)
+    position = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return trace_index, position
+
+
+def encode_prefixes(log: EventLog, prefix_length: int, padding: bool, labeling_type: str, columns: list,
+                    event_attributes: list = (), trace_attributes: list = ()) -> DataFrame:
+    """Vectorised prefix encoding laid out as [trace_id, trace attributes, (prefix_i, event attributes_i)*, label]"""
+    return encode_multiple_prefixes(
+        log, [prefix_length], padding, labeling_type, {prefix_length: columns}, event_attributes, trace_attributes
+    )[prefix_length]
+
+
+def encode_multiple_prefixes(log: EventLog, prefix_lengths: list, padding: bool, labeling_type: str, columns: dict,
+                             event_attributes: list = (), trace_attributes: list = ()) -> dict:
+    """Encodes the log once for every prefix length in prefix_lengths, columns maps each of them to its columns
+
+    The flat event table is grouped by position in the trace, a stable sort putting the events of every
+    position in a contiguous run, and each run is scattered into the columns of its position, one array per
+    event attribute typed from the values at that position alone. The cells of missing positions keep
+    PADDING_VALUE. Shorter prefixes take the leading columns of the longest one. The columns are then typed as
+    a frame built from the rows would type them.
+    """
+    event_columns = ['concept:name'] + list(event_attributes)
+    flat = flatten_log(log, prefix_lengths, padding, labeling_type, event_columns, trace_attributes)
+    n_traces = len(flat['trace_ids'])
+    max_prefix_length = max(prefix_lengths)
+
+    trace_index, position = event_positions(flat['lengths'])
+    order = np.argsort(position, kind='stable')
+    bounds = np.searchsorted(position[order], np.arange(max_prefix_length + 1))
+
+    arrays = [_to_object_array(flat['trace_ids'])] + list(flat['trace_attributes'].T)
+    for prefix_position in range(max_prefix_length):
+        rows = order[bounds[prefix_position]:bounds[prefix_position + 1]]
+        for index in range(len(event_columns)):
+            values = _typed_column(flat['events'][rows, index])
+            array = np.full(n_traces, PADDING_VALUE, dtype=values.dtype)
+            array[trace_index[rows]] = values
+            arrays.append(array)
+
+    first_event_column = 1 + len(trace_attributes)
+    encoded = {}
+    for prefix_length in prefix_lengths:
+        kept = flat['kept'][prefix_length]
+        n_columns = first_event_column + prefix_length * len(event_columns)
+        data = {column: array[kept] for column, array in zip(columns[prefix_length], arrays[:n_columns])}
+        data[columns[prefix_length][-1]] = flat['labels'][prefix_length]
+        encoded[prefix_length] = DataFrame(data, columns=columns[prefix_length]).infer_objects()
+    return encoded
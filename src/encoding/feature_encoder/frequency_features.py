@@ -1,59 +1,63 @@
-from collections import Counter
-from datetime import timedelta
-
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
-from pm4py.objects.log.log import EventLog, Trace, Event
-
-from src.labeling.common import add_label_column
-
-PREFIX_ = 'prefix_'
+from pm4py.objects.log.log import EventLog
+from scipy import sparse
 
+from src.encoding.feature_encoder.event_table import flatten_log, event_positions, PADDING_VALUE
 
-def frequency_features(log: EventLog, prefix_length, padding, labeling_type, columns: list = None) -> DataFrame:
-    if columns is None:
-        columns = _compute_columns(log, prefix_length)
-    encoded_data = []
-    for trace in log:
-        if len(trace) <= prefix_length - 1 and not padding:
-            # trace too short and no zero padding
-            continue
-        encoded_data.append(_trace_to_row(trace, prefix_length, columns, padding, labeling_type))
 
-    return DataFrame(columns=columns, data=encoded_data)
+def frequency_features(log: EventLog, prefix_length, padding, labeling_type, feature_list: list = None) -> DataFrame:
+    return frequency_features_multiple_prefixes(
+        log,
+        [prefix_length],
+        padding,
+        labeling_type,
+        {prefix_length: feature_list} if feature_list is not None else None
+    )[prefix_length]
 
 
-def _compute_columns(log: EventLog, prefix_length: int, padding: bool) -> list:
-    """trace_id, prefixes, any other columns, label
+def frequency_features_multiple_prefixes(log: EventLog, prefix_lengths: list, padding, labeling_type,
+                                         feature_lists: dict = None) -> dict:
+    """Bag of activities of the prefixes of every trace, laid out as [trace_id, activity counts, label]
 
+    The counts of all the prefix lengths are gathered from one walk of the log and kept as sparse columns, built
+    from a CSR matrix. With padding, the column of PADDING_VALUE counts the positions missing from a prefix.
+    The vocabulary is taken from the columns in feature_lists when given, so the validate and test frames share
+    the one of the train frame and drop the activities it does not know, otherwise from the prefixes of log.
     """
-    return ["trace_id"] + \
-           sorted(list({
-               event['concept:name']
-               for trace in log
-               for event in trace[:prefix_length]
-           })) + \
-           ['0'] if padding else [] + \
-           ['label']
-
-
-def _trace_to_row(trace: Trace, prefix_length: int, columns: list, padding: bool = True, labeling_type: str = None) -> list:
-    """Row in data frame"""
-    trace_row = [ trace.attributes['concept:name'] ]
-
-    if len(trace) <= prefix_length - 1 and not padding:
-        trace += [
-            Event({
-                'concept:name': '0',
-                'time:timestamp': trace[len(trace)] + timedelta(hours=i)
-            })
-            for i in range(len(trace), prefix_length + 1)
-        ]
-
-    occurences = Counter([
-        event['concept:name']
-        for event in trace[:prefix_length]
-    ])
-    trace_row += [ occurences[col] for col in columns ]
-    trace_row += [ add_label_column(trace, labeling_type, prefix_length) ]
-    return trace_row
+    flat = flatten_log(log, prefix_lengths, padding, labeling_type, ['concept:name'])
+    trace_index, position = event_positions(flat['lengths'])
+    activities = flat['events'][:, 0].astype(str)
+    n_traces = len(flat['trace_ids'])
+
+    encoded = {}
+    for prefix_length in prefix_lengths:
+        in_prefix = position < prefix_length
+        if feature_lists is not None:
+            vocabulary = [str(column) for column in feature_lists[prefix_length] if column not in ['trace_id', 'label']]
+        else:
+            vocabulary = sorted(set(activities[in_prefix]) | ({str(PADDING_VALUE)} if padding else set()))
+
+        codes = pd.Categorical(activities[in_prefix], categories=vocabulary).codes
+        known = codes >= 0
+        counts = sparse.csr_matrix(
+            (np.ones(known.sum(), dtype=np.int64), (trace_index[in_prefix][known], codes[known])),
+            shape=(n_traces, len(vocabulary))
+        )
+        if padding and str(PADDING_VALUE) in vocabulary:
+            missing = np.maximum(prefix_length - flat['lengths'], 0)
+            padded = np.flatnonzero(missing)
+            counts = counts + sparse.csr_matrix(
+                (missing[padded], (padded, np.full(len(padded), vocabulary.index(str(PADDING_VALUE))))),
+                shape=counts.shape
+            )
+
+        kept = flat['kept'][prefix_length]
+        encoded[prefix_length] = pd.concat([
+            DataFrame({'trace_id': np.array(flat['trace_ids'], dtype=object)[kept]}),
+            DataFrame.sparse.from_spmatrix(counts[kept], columns=vocabulary),
+            DataFrame({'label': flat['labels'][prefix_length]})
+        ], axis=1)
+    return encoded
 
@@ -1,6 +1,7 @@
 from pandas import DataFrame
 from pm4py.objects.log.log import EventLog, Trace
 
+from src.encoding.feature_encoder.event_table import encode_prefixes, encode_multiple_prefixes
 from src.labeling.common import add_label_column
 
 ATTRIBUTE_CLASSIFIER = None
@@ -9,14 +10,14 @@ PREFIX_ = 'prefix_'
 
 def simple_features(log: EventLog, prefix_length, padding, labeling_type, feature_list: list = None) -> DataFrame:
     columns = _compute_columns(prefix_length)
-    encoded_data = []
-    for trace in log:
-        if len(trace) <= prefix_length - 1 and not padding:
-            # trace too short and no zero padding
-            continue
-        encoded_data.append(_trace_to_row(trace, prefix_length, padding, labeling_type))
-
-    return DataFrame(columns=columns, data=encoded_data)
+    return encode_prefixes(log, prefix_length, padding, labeling_type, columns)
+
+
+def simple_features_multiple_prefixes(log: EventLog, prefix_lengths: list, padding, labeling_type,
+                                      feature_lists: dict = None) -> dict:
+    """simple_features for every prefix length in prefix_lengths, all of them encoded in one walk of the log"""
+    columns = {prefix_length: _compute_columns(prefix_length) for prefix_length in prefix_lengths}
+    return encode_multiple_prefixes(log, prefix_lengths, padding, labeling_type, columns)
 
 
 def _trace_to_row(trace: Trace, prefix_length: int, padding: bool = True, labeling_type: str = None) -> list:
@@ -0,0 +1,180 @@
+from functools import lru_cache
+
+import holidays
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pm4py.objects.log.log import EventLog
+
+from src.encoding.feature_encoder.event_table import flatten_log, event_positions, PADDING_VALUE, \
+    MISSING_EVENT_ATTRIBUTE
+
+PREFIX_ = 'prefix_'
+TIME_FEATURES = ['day', 'month', 'hour', 'weekday', 'holiday', 'elapsed_time']
+
+COUNTRIES = ('AO', 'AR', 'AW', 'AU', 'AT', 'BD', 'BY', 'BE', 'BR', 'BG', 'BI', 'CA', 'CL', 'CO', 'HR', 'CW', 'CZ',
+             'DK', 'DJ', 'DO', 'EG', 'England', 'EE', 'ECB', 'FI', 'FR', 'GE', 'DE', 'GR', 'HN', 'HK', 'HU', 'IS',
+             'IN', 'IE', 'IsleOfMan', 'IL', 'IT', 'JM', 'JP', 'KE', 'KR', 'LV', 'LT', 'LU', 'MW', 'MX', 'MA', 'MZ',
+             'NL', 'NZ', 'NI', 'NG', 'NO', 'PY', 'PE', 'PL', 'PT', 'PTE', 'RO', 'RU', 'SA', 'Scotland', 'RS', 'SG',
+             'SK', 'SI', 'ZA', 'ES', 'SE', 'CH', 'TR', 'UA', 'AE', 'GB', 'US', 'VN', 'Wales')
+
+_DURATION_UNITS = {
+    'd': 'days', 'days': 'days',
+    'h': 'hours', 'hours': 'hours',
+    'm': 'minutes', 'minutes': 'minutes',
+    's': 'seconds', 'seconds': 'seconds'
+}
+
+
+def time_features(log: EventLog, prefix_length, padding, labeling_type, feature_list: list = None) -> DataFrame:
+    return time_features_multiple_prefixes(log, [prefix_length], padding, labeling_type)[prefix_length]
+
+
+def time_features_multiple_prefixes(log: EventLog, prefix_lengths: list, padding, labeling_type,
+                                    feature_lists: dict = None) -> dict:
+    """Activity and TIME_FEATURES of every prefix position, for every prefix length in one walk of the log
+
+    elapsed_time is the number of seconds since the first event of the trace, holiday whether the day of the
+    event is a holiday in any of COUNTRIES. Positions past the end of a padded trace hold PADDING_VALUE.
+    """
+    flat = flatten_log(log, prefix_lengths, padding, labeling_type, ['concept:name', 'time:timestamp'])
+    features = _event_time_features(flat['events'][:, 1], flat['lengths'])
+    event_values = np.column_stack([flat['events'][:, 0]] + [features[feature] for feature in TIME_FEATURES])
+    n_event_columns = event_values.shape[1]
+
+    data = np.full((len(flat['trace_ids']), 1 + max(prefix_lengths) * n_event_columns), PADDING_VALUE, dtype=object)
+    data[:, 0] = flat['trace_ids']
+    trace_index, position = event_positions(flat['lengths'])
+    column_index = 1 + position[:, None] * n_event_columns + np.arange(n_event_columns)[None, :]
+    data[trace_index[:, None], column_index] = event_values
+
+    encoded = {}
+    for prefix_length in prefix_lengths:
+        n_columns = 1 + prefix_length * n_event_columns
+        prefix_data = np.empty((len(flat['kept'][prefix_length]), n_columns + 1), dtype=object)
+        prefix_data[:, :-1] = data[flat['kept'][prefix_length], :n_columns]
+        prefix_data[:, -1] = flat['labels'][prefix_length]
+        encoded[prefix_length] = DataFrame(columns=_compute_columns(prefix_length), data=prefix_data.tolist())
+    return encoded
+
+
+def _event_time_features(timestamps: np.ndarray, lengths: np.ndarray) -> dict:
+    """TIME_FEATURES of the flat event table, as integer arrays, events without a valid timestamp get 0"""
+    dates = parse_dates(np.where(timestamps == MISSING_EVENT_ATTRIBUTE, None, timestamps))
+    valid = ~dates.isna().to_numpy()
+    seconds = np.where(valid, dates.to_numpy(dtype='datetime64[s]').astype(np.int64), 0)
+
+    # first event of the trace of every event, empty traces have no event to point past the table
+    starts = np.minimum(np.cumsum(lengths) - lengths, max(len(seconds) - 1, 0))
+    first = np.repeat(seconds[starts], lengths) if len(seconds) else seconds
+    first_valid = np.repeat(valid[starts], lengths) if len(valid) else valid
+
+    days = dates.dt.normalize().to_numpy(dtype='datetime64[D]')
+    holiday = np.zeros(len(dates), dtype=bool)
+    if valid.any():
+        years = dates[valid].dt.year
+        holiday[valid] = np.isin(days[valid], holiday_dates(COUNTRIES, int(years.min()), int(years.max())))
+
+    return {
+        'day': np.where(valid, dates.dt.day.fillna(0), 0).astype(int),
+        'month': np.where(valid, dates.dt.month.fillna(0), 0).astype(int),
+        'hour': np.where(valid, dates.dt.hour.fillna(0), 0).astype(int),
+        'weekday': np.where(valid, dates.dt.weekday.fillna(0), 0).astype(int),
+        'holiday': holiday.astype(int),
+        'elapsed_time': np.where(valid & first_valid, seconds - first, 0).astype(int)
+    }
+
+
+@lru_cache(maxsize=None)
+def holiday_dates(countries: tuple, first_year: int, last_year: int) -> np.ndarray:
+    """Sorted holiday days of all countries between first_year and last_year, built once per arguments"""
+    years = list(range(first_year, last_year + 1))
+    days = set()
+    for country in countries:
+        try:
+            days.update(holidays.CountryHoliday(country, years=years).keys())
+        except (KeyError, NotImplementedError):
+            # country not supported by the installed holidays release
+            continue
+    return np.array(sorted(days), dtype='datetime64[D]')
+
+
+def parse_dates(values) -> pd.Series:
+    """Timezone naive datetimes of values, in the local time of each one, NaT where they cannot be parsed
+
+    The values pandas cannot parse are handed to dateparser, once per distinct string.
+    """
+    values = pd.Series(np.asarray(values, dtype=object))
+    try:
+        dates = pd.to_datetime(values, errors='coerce')
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+    except (ValueError, TypeError, AttributeError):
+        # mixed utc offsets, keep the local time of every value
+        dates = pd.to_datetime(
+            values.map(lambda value: value.replace(tzinfo=None) if hasattr(value, 'tzinfo') else value),
+            errors='coerce'
+        )
+
+    unparsed = dates.isna() & values.map(lambda value: isinstance(value, str) and value != '')
+    if unparsed.any():
+        import dateparser
+        parsed = {string: dateparser.parse(string) for string in values[unparsed].unique()}
+        dates[unparsed] = pd.to_datetime(values[unparsed].map(parsed), errors='coerce')
+    return dates
+
+
+def date_features(values) -> DataFrame:
+    """Day, month, year, time and holiday flag of the dates in values"""
+    dates = parse_dates(values)
+    valid = ~dates.isna().to_numpy()
+    holiday = np.zeros(len(dates), dtype=bool)
+    if valid.any():
+        years = dates[valid].dt.year
+        holiday[valid] = np.isin(
+            dates[valid].dt.normalize().to_numpy(dtype='datetime64[D]'),
+            holiday_dates(COUNTRIES, int(years.min()), int(years.max()))
+        )
+    return DataFrame({
+        'date_day': dates.dt.day,
+        'date_month': dates.dt.month,
+        'date_year': dates.dt.year,
+        'date_hours': dates.dt.hour,
+        'date_minutes': dates.dt.minute,
+        'date_seconds': dates.dt.second,
+        'date_special_occasion': holiday
+    })
+
+
+def duration_features(values) -> DataFrame:
+    """Days, hours, minutes and seconds of durations written as '2d 9h 37m 46s' or as plain milliseconds
+
+    Plain milliseconds are split into days, hours, minutes and seconds, the other durations keep the amount
+    given for each unit.
+    """
+    values = pd.Series(np.asarray(values, dtype=object)).astype(str).str.replace(' ', '', regex=False)
+    result = DataFrame(0, index=values.index, columns=['date_days', 'date_hours', 'date_minutes', 'date_seconds'])
+
+    milliseconds = values.str.fullmatch(r'\d+')
+    seconds = values[milliseconds].astype(np.int64) // 1000
+    result.loc[milliseconds, 'date_days'] = seconds // 86400
+    result.loc[milliseconds, 'date_hours'] = seconds // 3600 % 24
+    result.loc[milliseconds, 'date_minutes'] = seconds // 60 % 60
+    result.loc[milliseconds, 'date_seconds'] = seconds % 60
+
+    groups = values[~milliseconds].str.extractall(r'(?P<amount>\d+)(?P<unit>days|hours|minutes|seconds|d|h|m|s)')
+    if len(groups):
+        groups['amount'] = groups['amount'].astype(np.int64)
+        groups['unit'] = 'date_' + groups['unit'].map(_DURATION_UNITS)
+        totals = groups.groupby([groups.index.get_level_values(0), 'unit'])['amount'].sum().unstack(fill_value=0)
+        for column in totals:
+            result.loc[totals.index, column] = totals[column]
+    return result
+
+
+def _compute_columns(prefix_length: int) -> list:
+    """trace_id, activity and time features of every prefix position, label"""
+    columns = ['trace_id']
+    for i in range(1, prefix_length + 1):
+        columns += [PREFIX_ + str(i)] + [feature + '_' + str(i) for feature in TIME_FEATURES]
+    return columns + ['label']
@@ -1,7 +1,11 @@
 from enum import Enum
 
+from src.explanation.explanation_store import model_fingerprint, row_keys
+from src.explanation.sampling import stratified_sample
 from src.explanation.wrappers.lime_wrapper import lime_explain
 from src.explanation.wrappers.shap_wrapper import shap_explain
+from src.instrumentation.common import instrumented
+from src.predictive_model.predictive_model import drop_columns
 
 
 class ExplainerType(Enum):
@@ -9,10 +13,47 @@ class ExplainerType(Enum):
     LIME = 'lime'
 
 
-def explain(explainer, predictive_model, test_df, encoder):
+@instrumented('explain', items=lambda explanations, *args, **kwargs: len(explanations))
+def explain(explainer, predictive_model, test_df, encoder, n_workers=1, seed=None, store=None,
+            sample_per_cell=None):
+    """Explanations of every row of test_df keyed by trace id
+
+    With an ExplanationStore only the rows it does not hold for this explainer and model are explained, and
+    their explanations are added to it.
+    With sample_per_cell only the rows of at most sample_per_cell traces per (actual, predicted) cell are
+    explained, feedback_stability tells how much the feedback mined from them can be trusted.
+    """
+    if sample_per_cell is not None:
+        test_df = stratified_sample(predictive_model, test_df, encoder, sample_per_cell, seed=seed)
+
+    if store is None:
+        return _explain(explainer, predictive_model, test_df, encoder, n_workers, seed)
+
+    features = drop_columns(test_df)
+    fingerprint = model_fingerprint(predictive_model.model, features.columns)
+    keys = row_keys(features)
+    explanations = store.get(explainer, fingerprint, keys)
+
+    missing = [position for position, key in enumerate(keys) if key not in explanations]
+    if missing:
+        missing_df = test_df.iloc[missing]
+        # explained against the whole frame, as they would be without the store
+        computed = _explain(explainer, predictive_model, missing_df, encoder, n_workers, seed, background_df=test_df)
+        computed = {
+            keys[position]: computed[str(trace_id)]
+            for position, trace_id in zip(missing, missing_df['trace_id'])
+        }
+        store.put(explainer, fingerprint, computed)
+        explanations.update(computed)
+
+    return {str(trace_id): explanations[key] for trace_id, key in zip(test_df['trace_id'], keys)}
+
+
+def _explain(explainer, predictive_model, test_df, encoder, n_workers, seed, background_df=None):
     if explainer is ExplainerType.SHAP.value:
         return shap_explain(predictive_model, test_df, encoder)
     elif explainer is ExplainerType.LIME.value:
-        return lime_explain(predictive_model, test_df, encoder)
+        return lime_explain(
+            predictive_model, test_df, encoder, n_workers=n_workers, seed=seed, background_df=background_df)
     else:
         raise Exception('selected explainer not yet supported')
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+from pandas import DataFrame
+
+from src.predictive_model.compiled_forest import fitted_model
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = 'explanations.sqlite'
+MAX_BYTES = 512 * 1024 ** 2
+_MAX_VARIABLES = 500
+
+
+def model_fingerprint(model, columns) -> str:
+    """Fingerprint of the serialized model and of the feature columns it is explained on
+
+    A compiled forest shares the fingerprint of its forest, their explanations are the same.
+    """
+    fingerprint = hashlib.sha1(pickle.dumps(fitted_model(model)))
+    fingerprint.update(json.dumps([str(column) for column in columns]).encode())
+    return fingerprint.hexdigest()
+
+
+def row_keys(df: DataFrame) -> list:
+    """Hash of the encoded values of every row of df"""
+    matrix = df.to_numpy()
+    if matrix.dtype == object:
+        return [hashlib.sha1(repr(row.tolist()).encode()).hexdigest() for row in matrix]
+    matrix = np.ascontiguousarray(matrix)
+    dtype = str(matrix.dtype).encode()
+    return [hashlib.sha1(dtype + row.tobytes()).hexdigest() for row in matrix]
+
+
+class ExplanationStore:
+    """Explanations of single rows persisted in a sqlite file in directory
+
+    An entry is keyed by explainer type, model fingerprint and row hash. Once the stored explanations exceed
+    max_bytes, the least recently used ones are evicted. hits and misses count the rows looked up so far.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.directory, exist_ok=True)
+        connection = sqlite3.connect(os.path.join(self.directory, STORE_NAME))
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS explanations ('
+            'explainer TEXT, model TEXT, row TEXT, explanation TEXT, size INTEGER, last_used REAL, '
+            'PRIMARY KEY (explainer, model, row))'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS explanations_last_used ON explanations (last_used)')
+        return connection
+
+    def get(self, explainer: str, fingerprint: str, keys: list) -> dict:
+        """Stored explanations of the rows with the given keys, the ones not stored are left out"""
+        unique_keys = list(dict.fromkeys(keys))
+        found = {}
+        connection = self._connect()
+        try:
+            with connection:
+                for start in range(0, len(unique_keys), _MAX_VARIABLES):
+                    chunk = unique_keys[start:start + _MAX_VARIABLES]
+                    placeholders = ','.join('?' * len(chunk))
+                    found.update({
+                        row: json.loads(explanation)
+                        for row, explanation in connection.execute(
+                            'SELECT row, explanation FROM explanations '
+                            'WHERE explainer = ? AND model = ? AND row IN (' + placeholders + ')',
+                            [explainer, fingerprint] + chunk
+                        )
+                    })
+                    connection.execute(
+                        'UPDATE explanations SET last_used = ? '
+                        'WHERE explainer = ? AND model = ? AND row IN (' + placeholders + ')',
+                        [time.time(), explainer, fingerprint] + chunk
+                    )
+        finally:
+            connection.close()
+
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put(self, explainer: str, fingerprint: str, explanations: dict) -> None:
+        """Stores the explanations, keyed by row key, then evicts the least recently used ones over max_bytes"""
+        now = time.time()
+        records = []
+        for row, explanation in explanations.items():
+            explanation = json.dumps(explanation)
+            records += [(explainer, fingerprint, row, explanation, len(explanation), now)]
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO explanations VALUES (?, ?, ?, ?, ?, ?)', records)
+                self._evict(connection)
+        finally:
+            connection.close()
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM explanations').fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        evicted = []
+        for explainer, model, row, row_size in connection.execute(
+                'SELECT explainer, model, row, size FROM explanations ORDER BY last_used'):
+            if size <= self.max_bytes:
+                break
+            evicted += [(explainer, model, row)]
+            size -= row_size
+        connection.executemany('DELETE FROM explanations WHERE explainer = ? AND model = ? AND row = ?', evicted)
+        logger.debug('evicted {} stored explanations'.format(len(evicted)))
+
+    def clear(self) -> None:
+        path = os.path.join(self.directory, STORE_NAME)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,23 @@
+import numpy as np
+from pandas import DataFrame
+
+from src.confusion_matrix_feedback.confusion_matrix_feedback import feedback_confusion_matrix
+
+
+def stratified_sample(predictive_model, feedback_df, encoder, per_cell, seed=None) -> DataFrame:
+    """Rows of at most per_cell traces drawn from every (actual, predicted) cell of the confusion matrix
+
+    Cells with fewer traces are kept whole, so every cell can still reach the support of the pattern mining.
+    """
+    confusion_matrix = feedback_confusion_matrix(predictive_model, feedback_df, encoder)
+    random_state = np.random.RandomState(seed)
+
+    sampled = set()
+    for actual in confusion_matrix:
+        for predicted in confusion_matrix[actual]:
+            trace_ids = sorted(confusion_matrix[actual][predicted])
+            if len(trace_ids) > per_cell:
+                trace_ids = random_state.choice(trace_ids, size=per_cell, replace=False)
+            sampled.update(trace_ids)
+
+    return feedback_df[feedback_df['trace_id'].astype(str).isin(sampled)]
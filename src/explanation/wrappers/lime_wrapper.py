@@ -1,15 +1,38 @@
+from concurrent.futures import ProcessPoolExecutor
+
 from lime import lime_tabular
 import numpy as np
+from pandas import DataFrame
 
+from src.explanation.explanation_store import row_keys
 from src.predictive_model.predictive_model import drop_columns
 
+CHUNK_SIZE = 64
+
+_WORKER_DATA = {}
+
+
+class _Sampled(Exception):
+    """Raised by the recording classifier_fn to stop explain_instance once the perturbations are drawn"""
+
 
-def lime_explain(predictive_model, full_test_df, encoder):
+def lime_explain(predictive_model, full_test_df, encoder, n_workers=1, seed=None, chunk_size=CHUNK_SIZE,
+                 background_df=None):
+    """Explanations of the rows of full_test_df, background_df gives the labels and the data of the explainer
+
+    background_df is the frame full_test_df was taken from, full_test_df itself by default.
+    """
+    background_df = full_test_df if background_df is None else background_df
     test_df = drop_columns(full_test_df)
+    background = drop_columns(background_df)
+
+    labels = list(set(background_df['label']))
 
-    labels = list(set(full_test_df['label']))
+    if n_workers > 1 or seed is not None:
+        return _get_chunked_explanation(
+            test_df, full_test_df, background, encoder, predictive_model.model, labels, n_workers, seed, chunk_size)
 
-    explainer = _init_explainer(test_df, labels)
+    explainer = _init_explainer(background, labels)
     importances = _get_explanation(explainer, full_test_df, encoder, predictive_model.model, labels)
 
     return importances
@@ -59,3 +82,119 @@ def _explain_instance(explainer, row, model, target_df, labels):
     retval = sorted(retval, key=lambda x: x[0])
     return retval
 
+
+
+def _get_chunked_explanation(test_df, target_df, background, encoder, model, labels, n_workers, seed, chunk_size):
+    """Explains the rows in chunks of chunk_size, on a pool of n_workers processes when n_workers > 1
+
+    Every row is explained with its own random state derived from seed and its row key, the hash of its encoded
+    values it is stored under, so for a given seed the explanation of a row depends neither on n_workers or
+    chunk_size nor on the other rows explained with it.
+    """
+    if seed is None:
+        seed = np.random.randint(2 ** 31 - 1)
+    data = test_df.to_numpy()
+    row_seeds = [int(key[:8], 16) for key in row_keys(test_df)]
+    columns = list(test_df.columns)
+    num_features = len(target_df.columns)
+    starts = list(range(0, len(data), chunk_size))
+    chunks = [data[start:start + chunk_size] for start in starts]
+    seed_chunks = [row_seeds[start:start + chunk_size] for start in starts]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_worker,
+                initargs=(background.to_numpy(), columns, labels, model, seed, num_features)) as executor:
+            importances = sum(executor.map(_explain_chunk, seed_chunks, chunks), [])
+    else:
+        explainer = _init_explainer(background, labels)
+        importances = sum([
+            _explain_rows(explainer, model, labels, seed, num_features, chunk_seeds, chunk)
+            for chunk_seeds, chunk in zip(seed_chunks, chunks)
+        ], [])
+
+    decoded = encoder.decode_rows(target_df)
+    return {
+        str(trace_id):
+            np.column_stack((
+                target_df.columns[1:-1],
+                np.array(decoded[index].tolist())[1:-1],
+                importances[index]
+            )).tolist()
+        for index, trace_id in enumerate(target_df['trace_id'])
+    }
+
+
+def _init_worker(data, columns, labels, model, seed, num_features):
+    # the explainer is built once per worker, the chunks only carry their rows
+    _WORKER_DATA['explainer'] = _init_explainer(DataFrame(data, columns=columns), labels)
+    _WORKER_DATA['model'] = model
+    _WORKER_DATA['labels'] = labels
+    _WORKER_DATA['seed'] = seed
+    _WORKER_DATA['num_features'] = num_features
+
+
+def _explain_chunk(row_seeds, rows):
+    return _explain_rows(
+        _WORKER_DATA['explainer'],
+        _WORKER_DATA['model'],
+        _WORKER_DATA['labels'],
+        _WORKER_DATA['seed'],
+        _WORKER_DATA['num_features'],
+        row_seeds,
+        rows
+    )
+
+
+def _explain_rows(explainer, model, labels, seed, num_features, row_seeds, rows) -> list:
+    """Importances of every row towards its predicted class, sorted by feature
+
+    explain_instance is run twice per row with the same random state: the first run only records the
+    perturbations it draws, so that those of the whole chunk go through model.predict_proba together, the
+    second one fits the local model on the probabilities of its own perturbations.
+    """
+    samples = []
+    for row_seed, row in zip(row_seeds, rows):
+        _reseed(explainer, seed, row_seed)
+        try:
+            explainer.explain_instance(
+                row, _recording_classifier(samples), num_features=num_features, labels=[i - 1 for i in labels])
+        except _Sampled:
+            pass
+
+    probabilities = np.split(
+        model.predict_proba(np.concatenate(samples)),
+        np.cumsum([len(sample) for sample in samples])[:-1]
+    )
+    predicted = model.predict(rows)
+
+    importances = []
+    for position, row in enumerate(rows):
+        _reseed(explainer, seed, row_seeds[position])
+        explanation = explainer.explain_instance(
+            row, _replaying_classifier(probabilities[position]), num_features=num_features,
+            labels=[i - 1 for i in labels]
+        )
+        importances += [[
+            importance
+            for _, importance in sorted(explanation.local_exp[int(predicted[position]) - 1], key=lambda x: x[0])
+        ]]
+    return importances
+
+
+def _reseed(explainer, seed, row_seed):
+    for component in [explainer, explainer.base, getattr(explainer, 'discretizer', None)]:
+        if component is not None and hasattr(component, 'random_state'):
+            component.random_state = np.random.RandomState([seed, row_seed])
+
+
+def _recording_classifier(samples):
+    def classifier_fn(perturbations):
+        samples.append(perturbations)
+        raise _Sampled()
+    return classifier_fn
+
+
+def _replaying_classifier(probabilities):
+    return lambda perturbations: probabilities
@@ -1,13 +1,14 @@
 import numpy as np
 import shap
 
-from src.predictive_model.predictive_model import drop_columns
+from src.predictive_model.compiled_forest import fitted_model
+from src.predictive_model.predictive_model import drop_columns, model_input
 
 
 def shap_explain(predictive_model, full_test_df, encoder):
     test_df = drop_columns(full_test_df)
 
-    explainer = _init_explainer(predictive_model.model, test_df)
+    explainer = _init_explainer(fitted_model(predictive_model.model), test_df)
     importances = _get_explanation(explainer, predictive_model.model, full_test_df, encoder)
 
     return importances
@@ -27,15 +28,27 @@ def _init_explainer(model, df):
 
 
 def _get_explanation(explainer, model, target_df, encoder):
+    # the whole frame goes through the explainer and the model once, then is split back per trace
+    df = drop_columns(target_df)
+    features = model_input(df)
+    shap_values = explainer.shap_values(features)
+    predicted = model.predict(features)
+    decoded = encoder.decode_rows(df)
     return {
-        str(row['trace_id']):
+        str(trace_id):
             np.column_stack((
-                drop_columns(target_df).columns,
-                encoder.decode_row(drop_columns(row.to_frame(0).T).squeeze()),
-                explainer.shap_values(
-                    drop_columns(row.to_frame(0).T)
-                )[int(model.predict(drop_columns(row.to_frame().T))[0]) - 1].T  # list(row['predicted'])[0]
-            )).tolist()                                                         # is the one vs all
-        for _, row in target_df.iterrows()                                      # method!
+                df.columns,
+                np.array(decoded[index].tolist()),
+                _class_values(shap_values, index, int(predicted[index]) - 1)  # list(row['predicted'])[0]
+            )).tolist()                                                      # is the one vs all
+        for index, trace_id in enumerate(target_df['trace_id'])             # method!
     }
 
+
+def _class_values(shap_values, row_index, class_index) -> np.array:
+    """Shap values of one row towards one class, whether the explainer returns a list per class or a single array"""
+    if isinstance(shap_values, list):
+        return shap_values[class_index][row_index]
+    if shap_values.ndim == 3:
+        return shap_values[row_index, :, class_index]
+    return shap_values[row_index]
@@ -2,9 +2,13 @@ from enum import Enum
 
 import hyperopt
 import numpy as np
-from hyperopt import Trials, hp, fmin
+from hyperopt import hp, fmin, STATUS_OK
 from hyperopt.pyll import scope
 
+from src.hyperparameter_optimisation.parallel_trials import run_parallel_trials
+from src.hyperparameter_optimisation.successive_halving import successive_halving
+from src.hyperparameter_optimisation.trial_store import TrialStore, dataset_fingerprint, incumbent, prior_trials
+from src.instrumentation.common import instrumented, RECORDER
 from src.predictive_model.common import PredictionMethods
 
 
@@ -13,6 +17,45 @@ class HyperoptTarget(Enum):
     F1 = 'f1_score'
 
 
+class SearchMode(Enum):
+    TPE = 'tpe'
+    SUCCESSIVE_HALVING = 'successive_halving'
+
+
+class ModelSelection(Enum):
+    KEEP_BEST = 'keep_best'
+    REFIT = 'refit'
+
+
+class _BestModelKeeper:
+    """Strips the fitted model from every trial result, holding on only to the one of the best trial so far"""
+
+    def __init__(self, keep_model: bool):
+        self.keep_model = keep_model
+        self.loss = float('inf')
+        self.model = None
+        self.result = None
+
+    def __call__(self, result: dict) -> dict:
+        model = result.pop('model', None)
+        if 'timing' in result:
+            # trials evaluated in worker processes are timed there, their span comes back with the result
+            RECORDER.extend([result.pop('timing')])
+        if result['status'] == STATUS_OK and result['loss'] < self.loss:
+            self.loss = result['loss']
+            self.result = result
+            if self.keep_model:
+                self.model = model
+        return result
+
+
+def _train_and_record(predicitive_model, config, target, name) -> dict:
+    """Trains and evaluates config outside the search, its timing recorded in RECORDER as a span named name"""
+    result = predicitive_model.train_and_evaluate_configuration(config=config, target=target)
+    RECORDER.extend([dict(result.pop('timing'), name=name, category='hyperopt')])
+    return result
+
+
 def _get_space(model_type) -> dict:
     if model_type is PredictionMethods.RANDOM_FOREST.value:
         return {
@@ -54,19 +97,85 @@ def _get_space(model_type) -> dict:
         raise Exception('unsupported model_type')
 
 
-def retrieve_best_model(predicitive_model, model_type, max_evaluations, target):
+@instrumented('retrieve_best_model')
+def retrieve_best_model(predicitive_model, model_type, max_evaluations, target, n_workers=1, seed=None,
+                        model_selection=ModelSelection.KEEP_BEST.value, search_mode=SearchMode.TPE.value,
+                        trial_store=None, reuse_tolerance=None, batch_size=None):
+    """Best model and config of model_type found by search_mode, kept from the search or refitted by model_selection
 
+    trial_store persists the TPE trials across searches on the same dataset, batch_size defaults to n_workers.
+    """
+    if search_mode not in [mode.value for mode in SearchMode]:
+        raise Exception('unsupported search_mode')
+    if model_selection not in [selection.value for selection in ModelSelection]:
+        raise Exception('unsupported model_selection')
     space = _get_space(model_type)
-    trials = Trials()
-
-    fmin(
-        lambda x: predicitive_model.train_and_evaluate_configuration(config=x, target=target),
-        space,
-        algo=hyperopt.tpe.suggest,
-        max_evals=max_evaluations,
-        trials=trials
-    )
-    best_candidate = trials.best_trial['result']
+
+    records = []
+    if trial_store is not None:
+        trial_store = trial_store if isinstance(trial_store, TrialStore) else TrialStore(trial_store)
+        fingerprint = dataset_fingerprint(predicitive_model)
+        records = trial_store.load(model_type, fingerprint)
+
+    best_record = incumbent(records)
+    if best_record is not None and reuse_tolerance is not None:
+        config = dict(best_record['config'])
+        if seed is not None:
+            config['random_state'] = seed
+        result = _train_and_record(predicitive_model, config, target, 'hyperopt_reuse')
+        if result['status'] == STATUS_OK and result['loss'] <= best_record['loss'] + reuse_tolerance:
+            print('reused_candidate[config] ==> ', config)
+            return result['model'], config
+
+    if search_mode == SearchMode.SUCCESSIVE_HALVING.value:
+        with RECORDER.span('successive_halving', 'hyperopt', items=max_evaluations):
+            model, config = successive_halving(
+                predicitive_model, space, max_evaluations, target, seed=seed, n_workers=n_workers
+            )
+        print('best_candidate[config] ==> ', config)
+        if model_selection == ModelSelection.REFIT.value:
+            model = _train_and_record(predicitive_model, config, target, 'hyperopt_refit')['model']
+        return model, config
+    keeper = _BestModelKeeper(keep_model=model_selection == ModelSelection.KEEP_BEST.value)
+
+    trials = prior_trials(records, space)
+    n_prior_trials = len(trials.trials)
+
+    if n_workers > 1 or seed is not None or batch_size is not None:
+        trials = run_parallel_trials(
+            predicitive_model,
+            space,
+            hyperopt.tpe.suggest,
+            max_evaluations,
+            target,
+            n_workers,
+            seed,
+            on_result=keeper,
+            return_models=keeper.keep_model,
+            trials=trials,
+            batch_size=batch_size
+        )
+    else:
+        fmin(
+            lambda x: keeper(predicitive_model.train_and_evaluate_configuration(config=x, target=target)),
+            space,
+            algo=hyperopt.tpe.suggest,
+            max_evals=n_prior_trials + max_evaluations,
+            trials=trials
+        )
+
+    if trial_store is not None:
+        trial_store.save(model_type, fingerprint, trials, skip=n_prior_trials)
+
+    # the stored trials only guide the search, the best candidate is among the ones evaluated on this dataset
+    best_candidate = keeper.result
+    if best_candidate is None:
+        raise Exception('no configuration could be evaluated')
     print('best_candidate[config] ==> ', best_candidate['config'])
 
-    return best_candidate['model'], best_candidate['config']
+    if model_selection == ModelSelection.REFIT.value:
+        model = _train_and_record(predicitive_model, best_candidate['config'], target, 'hyperopt_refit')['model']
+    else:
+        model = keeper.model
+
+    return model, best_candidate['config']
@@ -0,0 +1,140 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, ExitStack
+
+import numpy as np
+from hyperopt import Trials, space_eval
+from hyperopt.base import Domain, JOB_STATE_DONE, spec_from_misc
+from pandas import DataFrame
+from scipy import sparse
+
+from src.predictive_model.predictive_model import train_and_evaluate_configuration, model_input
+
+_WORKER_DATA = {}
+
+
+def _share(arrays: dict, directory: str) -> dict:
+    """Dumps the numeric arrays to .npy files in directory, the workers memory map them instead of receiving copies
+
+    Sparse matrices are small enough to be sent to the workers as they are.
+    """
+    shared = {}
+    for name, array in arrays.items():
+        if sparse.issparse(array) or array.dtype == object:
+            shared[name] = array
+        else:
+            shared[name] = os.path.join(directory, name + '.npy')
+            np.save(shared[name], array)
+    return shared
+
+
+def _init_worker(model_type, target, columns, shared, return_models):
+    _WORKER_DATA['model_type'] = model_type
+    _WORKER_DATA['return_models'] = return_models
+    _WORKER_DATA['target'] = target
+    _WORKER_DATA['columns'] = columns
+    _WORKER_DATA['arrays'] = {
+        name: np.load(value, mmap_mode='r') if isinstance(value, str) else value
+        for name, value in shared.items()
+    }
+
+
+def worker_datasets() -> tuple:
+    """Train features, train labels, validate features and validate labels of the worker_pool process it runs in"""
+    arrays = _WORKER_DATA['arrays']
+    return (
+        _worker_frame(arrays['train']),
+        arrays['train_labels'],
+        _worker_frame(arrays['validate']),
+        arrays['validate_labels']
+    )
+
+
+def _evaluate_in_worker(config):
+    result = train_and_evaluate_configuration(
+        _WORKER_DATA['model_type'], config, _WORKER_DATA['target'], *worker_datasets()
+    )
+    if not _WORKER_DATA['return_models']:
+        # spares sending back a model that is going to be dropped anyway
+        result.pop('model', None)
+    return result
+
+
+def _worker_frame(array):
+    return array if sparse.issparse(array) else DataFrame(array, columns=_WORKER_DATA['columns'])
+
+
+def _feature_matrix(df: DataFrame):
+    # the forests fit on float32 anyway, storing it as such lets them use the memory mapped matrix as is
+    features = model_input(df)
+    if sparse.issparse(features):
+        return features.astype(np.float32)
+    if all(dtype.kind in 'biuf' for dtype in df.dtypes):
+        return np.ascontiguousarray(df.to_numpy(dtype=np.float32))
+    return df.to_numpy()
+
+
+@contextmanager
+def worker_pool(predictive_model, target, n_workers, return_models=True):
+    """ProcessPoolExecutor of n_workers processes sharing the train and validate matrices of predictive_model"""
+    with tempfile.TemporaryDirectory() as directory:
+        shared = _share({
+            'train': _feature_matrix(predictive_model.train_df),
+            'train_labels': predictive_model.full_train_df['label'].to_numpy(),
+            'validate': _feature_matrix(predictive_model.validate_df),
+            'validate_labels': predictive_model.full_validate_df['label'].to_numpy()
+        }, directory)
+        executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(
+                predictive_model.model_type, target, list(predictive_model.train_df.columns), shared, return_models
+            )
+        )
+        try:
+            yield executor
+        finally:
+            executor.shutdown()
+
+
+def run_parallel_trials(predictive_model, space, algo, max_evaluations, target, n_workers, seed=None,
+                        on_result=None, return_models=True, trials=None, batch_size=None) -> Trials:
+    """Runs the hyperopt search evaluating batch_size suggested configurations at a time on a process pool
+
+    batch_size is n_workers by default. Every batch is suggested by algo from the trials completed so far, so
+    for a given seed and batch_size the suggested configurations, and the models fitted with random_state=seed,
+    are reproducible, whatever the number of processes evaluating them.
+    on_result is applied to every result, in trial order, before it is stored in the trials.
+    Given trials, max_evaluations new trials are added to the ones it already holds.
+    """
+    trials = Trials() if trials is None else trials
+    batch_size = n_workers if batch_size is None else batch_size
+    max_evaluations += len(trials.trials)
+    domain = Domain(lambda config: None, space)
+    rstate = np.random.RandomState(seed)
+
+    with ExitStack() as stack:
+        if n_workers > 1:
+            executor = stack.enter_context(worker_pool(predictive_model, target, n_workers, return_models))
+            evaluate = lambda configs: list(executor.map(_evaluate_in_worker, configs))
+        else:
+            evaluate = lambda configs: [
+                predictive_model.train_and_evaluate_configuration(config=config, target=target) for config in configs
+            ]
+
+        while len(trials.trials) < max_evaluations:
+            new_ids = trials.new_trial_ids(min(batch_size, max_evaluations - len(trials.trials)))
+            trials.refresh()
+            new_trials = algo(new_ids, domain, trials, rstate.randint(2 ** 31 - 1))
+            configs = [space_eval(space, spec_from_misc(trial['misc'])) for trial in new_trials]
+            if seed is not None:
+                configs = [dict(config, random_state=seed) for config in configs]
+
+            for trial, result in zip(new_trials, evaluate(configs)):
+                trial['state'] = JOB_STATE_DONE
+                trial['result'] = on_result(result) if on_result is not None else result
+            trials.insert_trial_docs(new_trials)
+            trials.refresh()
+
+    return trials
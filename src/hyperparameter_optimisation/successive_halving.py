@@ -0,0 +1,104 @@
+import logging
+import math
+from contextlib import ExitStack
+
+import numpy as np
+from hyperopt import Trials, rand, space_eval
+from hyperopt.base import Domain, spec_from_misc
+
+from src.evaluation.common import evaluate
+from src.hyperparameter_optimisation.parallel_trials import worker_pool, worker_datasets
+from src.instrumentation.common import RECORDER
+from src.predictive_model.predictive_model import instantiate_model, model_input
+
+logger = logging.getLogger(__name__)
+
+MAX_ESTIMATORS = 1000
+ETA = 3
+
+
+def _rung_budgets(n_configurations: int, max_estimators: int, eta: int) -> list:
+    """Number of trees of every rung, growing by eta up to max_estimators, one rung per eta-fold reduction"""
+    n_rungs = int(math.floor(math.log(max(n_configurations, 1), eta) + 1e-9)) + 1
+    return [max(1, int(round(max_estimators / eta ** (n_rungs - 1 - rung)))) for rung in range(n_rungs)]
+
+
+def _grow_and_evaluate(model, n_estimators, target, train, train_labels, validate, validate_labels):
+    # with warm_start only the missing trees are fitted
+    model.set_params(n_estimators=n_estimators)
+    model.fit(train, train_labels)
+    predicted = model.predict(validate)
+    scores = model.predict_proba(validate)[:, 1]
+    return evaluate(validate_labels, predicted, scores, loss=target)['loss']
+
+
+def _grow(task, datasets) -> tuple:
+    """Grown model of task and its validation target, None if it could not be fitted"""
+    config, model, n_estimators, target = task
+    try:
+        loss = _grow_and_evaluate(model, n_estimators, target, *datasets)
+    except Exception as e:
+        logger.debug('dropping configuration {}: {}'.format(config, e))
+        loss = None
+    return loss, model
+
+
+def _grow_in_worker(task) -> tuple:
+    return _grow(task, worker_datasets())
+
+
+def successive_halving(predictive_model, space, n_configurations, target, max_estimators=MAX_ESTIMATORS, eta=ETA,
+                       seed=None, n_workers=1) -> tuple:
+    """Successive halving search over n_configurations sampled from space, using the forest size as budget
+
+    All the configurations start as small warm_start forests, at every rung only the best 1/eta of them, by
+    validation target, are grown eta times bigger, the others are dropped. With n_workers > 1 the forests of a
+    rung are grown on a pool of n_workers processes, each one as it would be on its own, so the result does
+    not depend on n_workers. Returns the best model and config.
+    """
+    trials = Trials()
+    sampled = rand.suggest(
+        trials.new_trial_ids(n_configurations),
+        Domain(lambda config: None, space),
+        trials,
+        np.random.RandomState(seed).randint(2 ** 31 - 1)
+    )
+    candidates = []
+    for trial in sampled:
+        config = dict(space_eval(space, spec_from_misc(trial['misc'])), warm_start=True)
+        if seed is not None:
+            config['random_state'] = seed
+        candidates += [(config, instantiate_model(predictive_model.model_type, config))]
+
+    budgets = _rung_budgets(n_configurations, max_estimators, eta)
+    with ExitStack() as stack:
+        if n_workers > 1:
+            executor = stack.enter_context(worker_pool(predictive_model, target, n_workers))
+            grow = lambda tasks: list(executor.map(_grow_in_worker, tasks))
+        else:
+            datasets = (
+                model_input(predictive_model.train_df),
+                predictive_model.full_train_df['label'],
+                model_input(predictive_model.validate_df),
+                predictive_model.full_validate_df['label']
+            )
+            grow = lambda tasks: [_grow(task, datasets) for task in tasks]
+
+        for rung, n_estimators in enumerate(budgets):
+            with RECORDER.span('successive_halving_rung', 'hyperopt', items=len(candidates)):
+                grown = grow([(config, model, n_estimators, target) for config, model in candidates])
+            scored = [
+                (loss, config, model) for (config, _), (loss, model) in zip(candidates, grown) if loss is not None
+            ]
+            if not scored:
+                raise Exception('no configuration could be evaluated')
+
+            # stable sort, ties keep the sampling order
+            scored = sorted(scored, key=lambda element: -element[0])
+            n_survivors = 1 if rung == len(budgets) - 1 else max(1, len(scored) // eta)
+            candidates = [(config, model) for _, config, model in scored[:n_survivors]]
+            logger.debug('rung {}: {} trees, best {} {}'.format(rung, n_estimators, target, scored[0][0]))
+
+    config, model = candidates[0]
+    config['n_estimators'] = model.n_estimators
+    return model, config
@@ -0,0 +1,152 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+import numpy as np
+from hyperopt import Trials, STATUS_OK
+from hyperopt.base import Domain, JOB_STATE_DONE
+
+logger = logging.getLogger(__name__)
+
+STORE_SUFFIX = '.trials.json'
+LOCK_SUFFIX = '.lock'
+MAX_RECORDS = 200
+
+
+def dataset_fingerprint(predictive_model) -> str:
+    """Fingerprint of the dataset of predictive_model that ignores the values of the features
+
+    Built from the model type, the feature columns and the trace ids and labels of the train and validate
+    splits, so datasets that only differ by shuffled feature values, as in the retrain loop, share it.
+    Whether inference runs on a compiled forest is left out, it does not change the trials.
+    """
+    fingerprint = hashlib.sha1(predictive_model.model_type.encode())
+    fingerprint.update(json.dumps([str(column) for column in predictive_model.train_df.columns]).encode())
+    for df in [predictive_model.full_train_df, predictive_model.full_validate_df]:
+        for column in ['trace_id', 'label']:
+            fingerprint.update(json.dumps(df[column].astype(str).tolist()).encode())
+    return fingerprint.hexdigest()
+
+
+def _to_python(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def to_record(vals: dict, loss: float, config: dict) -> dict:
+    """Stored record of a trial, its hyperopt vals, loss and config as plain json values"""
+    return {
+        'vals': {label: [_to_python(value) for value in values] for label, values in vals.items()},
+        'loss': float(loss),
+        'config': {key: _to_python(value) for key, value in config.items()}
+    }
+
+
+class TrialStore:
+    """Completed hyperopt trials persisted in directory, one json file per model type and dataset fingerprint
+
+    Only the max_records best records of every file are kept. The writes of concurrent searches, in other
+    processes, are serialised by a lock file next to the store. A read_only store is loaded but never written.
+    """
+
+    def __init__(self, directory: str, max_records: int = MAX_RECORDS, read_only: bool = False):
+        self.directory = directory
+        self.max_records = max_records
+        self.read_only = read_only
+
+    def _path(self, model_type: str, fingerprint: str) -> str:
+        return os.path.join(self.directory, model_type + '-' + fingerprint + STORE_SUFFIX)
+
+    @contextmanager
+    def _locked(self, path: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path + LOCK_SUFFIX, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self, model_type: str, fingerprint: str) -> list:
+        path = self._path(model_type, fingerprint)
+        if not os.path.exists(path):
+            return []
+        with open(path) as file:
+            return json.load(file)
+
+    def save(self, model_type: str, fingerprint: str, trials: Trials, skip: int = 0) -> None:
+        """Adds the successful trials after the first skip ones, the already stored ones, to the store"""
+        records = []
+        for trial in trials.trials[skip:]:
+            result = trial['result']
+            if result.get('status') != STATUS_OK:
+                continue
+            records += [to_record(trial['misc']['vals'], result['loss'], result['config'])]
+        self.add(model_type, fingerprint, records)
+
+    def add(self, model_type: str, fingerprint: str, records: list) -> None:
+        """Merges records into the store, keeping the best max_records of them, one per configuration"""
+        if self.read_only or not records:
+            return
+        path = self._path(model_type, fingerprint)
+        with self._locked(path):
+            # loaded under the lock, the records saved meanwhile by another search are kept
+            best = {}
+            for record in self.load(model_type, fingerprint) + records:
+                key = json.dumps(record['vals'], sort_keys=True)
+                if key not in best or record['loss'] < best[key]['loss']:
+                    best[key] = record
+            # stable sort, equal losses keep their insertion order
+            kept = sorted(best.values(), key=lambda record: record['loss'])[:self.max_records]
+            # written aside and swapped in, an interrupted run never leaves a truncated store behind
+            with open(path + '.tmp', 'w') as file:
+                json.dump(kept, file)
+            os.replace(path + '.tmp', path)
+
+    def clear(self, model_type: str = None) -> None:
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(STORE_SUFFIX) and (model_type is None or name.startswith(model_type + '-')):
+                os.remove(os.path.join(self.directory, name))
+
+
+def incumbent(records: list) -> dict:
+    """Stored record with the lowest loss, None if there is none"""
+    return min(records, key=lambda record: record['loss']) if records else None
+
+
+def prior_trials(records: list, space) -> Trials:
+    """Trials pre filled with the stored records, as if already evaluated, for TPE to start its search from
+
+    Records whose labels do not match the ones of space, stored before the space was changed, are skipped.
+    """
+    trials = Trials()
+    labels = set(Domain(lambda config: None, space).params)
+    records = [record for record in records if set(record['vals']) == labels]
+    if not records:
+        return trials
+
+    tids = trials.new_trial_ids(len(records))
+    docs = trials.new_trial_docs(
+        tids,
+        [None] * len(records),
+        [{'status': STATUS_OK, 'loss': record['loss'], 'config': record['config']} for record in records],
+        [{
+            'tid': tid,
+            'cmd': ('domain_attachment', 'FMinIter_Domain'),
+            'workdir': None,
+            'idxs': {label: [tid] if values else [] for label, values in record['vals'].items()},
+            'vals': record['vals']
+        } for tid, record in zip(tids, records)]
+    )
+    for doc in docs:
+        doc['state'] = JOB_STATE_DONE
+    trials.insert_trial_docs(docs)
+    trials.refresh()
+    logger.debug('starting from {} stored trials'.format(len(records)))
+    return trials
@@ -0,0 +1,130 @@
+import functools
+import json
+import logging
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def _process_peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on linux, and is the peak of the whole process so far, not of a span
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count(value):
+    """Number of items of value, None if it has no length"""
+    return len(value) if hasattr(value, '__len__') else None
+
+
+@contextmanager
+def measured(name: str, category: str, items=None):
+    """Yields a span dict that is filled with the wall time, cpu time, memory and throughput of the block
+
+    The memory is the peak RSS of the process up to the end of the block, process_peak_rss_mb, and how much
+    the block raised it, peak_rss_growth_mb, zero for a block staying below an earlier peak.
+    items can also be set on the span inside the block, once the number of processed items is known.
+    """
+    span = {'name': name, 'category': category, 'pid': os.getpid(), 'start': time.time(), 'items': items}
+    peak_rss_start = _process_peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield span
+    finally:
+        span['wall_time'] = time.perf_counter() - wall_start
+        span['cpu_time'] = time.process_time() - cpu_start
+        span['process_peak_rss_mb'] = _process_peak_rss_mb()
+        span['peak_rss_growth_mb'] = span['process_peak_rss_mb'] - peak_rss_start
+        span['items_per_second'] = \
+            span['items'] / span['wall_time'] if span['items'] is not None and span['wall_time'] > 0 else None
+
+
+class Recorder:
+    """Spans recorded by the instrumented calls of this process, and the ones merged from worker processes"""
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def span(self, name: str, category: str = 'stage', items=None):
+        with measured(name, category, items) as span:
+            try:
+                yield span
+            finally:
+                self.spans.append(span)
+
+    def extend(self, spans: list) -> None:
+        self.spans.extend(spans)
+
+    def clear(self) -> None:
+        self.spans = []
+
+    def summary(self) -> dict:
+        """Totals per span name: calls, wall and cpu time, items, throughput, the highest process peak RSS and
+        the largest growth of it"""
+        summary = {}
+        for span in self.spans:
+            total = summary.setdefault(span['name'], {
+                'category': span['category'], 'calls': 0, 'wall_time': 0., 'cpu_time': 0., 'items': None,
+                'process_peak_rss_mb': 0., 'peak_rss_growth_mb': 0.
+            })
+            total['calls'] += 1
+            total['wall_time'] += span['wall_time']
+            total['cpu_time'] += span['cpu_time']
+            total['process_peak_rss_mb'] = max(total['process_peak_rss_mb'], span['process_peak_rss_mb'])
+            total['peak_rss_growth_mb'] = max(total['peak_rss_growth_mb'], span['peak_rss_growth_mb'])
+            if span['items'] is not None:
+                total['items'] = (total['items'] or 0) + span['items']
+        for total in summary.values():
+            total['items_per_second'] = \
+                total['items'] / total['wall_time'] if total['items'] is not None and total['wall_time'] > 0 else None
+        return summary
+
+    def write_report(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'summary': self.summary(), 'spans': self.spans}, file, indent=2, default=str)
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Spans as complete events of the trace event format, viewable in chrome://tracing or Perfetto"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': [
+                {
+                    'name': span['name'],
+                    'cat': span['category'],
+                    'ph': 'X',
+                    'ts': span['start'] * 1e6,
+                    'dur': span['wall_time'] * 1e6,
+                    'pid': span['pid'],
+                    'tid': span['pid'],
+                    'args': {
+                        key: span[key] for key in [
+                            'cpu_time', 'process_peak_rss_mb', 'peak_rss_growth_mb', 'items', 'items_per_second'
+                        ]
+                    }
+                }
+                for span in self.spans
+            ], 'displayTimeUnit': 'ms'}, file, default=str)
+
+
+RECORDER = Recorder()
+
+
+def instrumented(name: str, items=None):
+    """Records every call of the decorated function as a span of RECORDER
+
+    items, called with the result followed by the arguments of the call, returns the number of items processed.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with RECORDER.span(name) as span:
+                result = function(*args, **kwargs)
+                if items is not None:
+                    span['items'] = items(result, *args, **kwargs)
+            return result
+        return wrapper
+    return decorator
@@ -1,4 +1,6 @@
+import glob
 import logging
+import os
 import pathlib
 
 from pm4py.objects.conversion.log import factory as conversion_factory
@@ -9,6 +11,10 @@ from pm4py.objects.log.importer.xes.factory import import_log as import_log_xes
 from pm4py.objects.log.log import EventLog
 from pm4py.util import constants
 
+from src.instrumentation.common import instrumented, count
+from src.log.log_cache import get_cached_log, is_cached
+from src.log.xes_stream import XesTraceStream
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,11 +38,40 @@ export_log = {
 }
 
 
-def get_log(filepath: str = None) -> EventLog:
+stream_log = {
+    '.xes': XesTraceStream
+}
+
+
+def log_suffix(filepath: str) -> str:
+    """First suffix of filepath, the one telling the format of the log, '.xes' for a .xes.gz file"""
+    suffixes = pathlib.Path(filepath).suffixes
+    return suffixes[0] if suffixes else ''
+
+
+@instrumented('get_log', items=lambda log, *args, **kwargs: count(log))
+def get_log(filepath: str = None, streaming: bool = False, cache_dir: str = None) -> EventLog:
     """Read in event log from disk
 
-    Uses xes_importer to parse log.
+    Uses xes_importer to parse log, if streaming is set the traces are instead lazily parsed from disk
+    on every iteration, keeping only one trace in memory at a time.
+    If cache_dir is set the parsed log is stored there as columnar tables and later loads of the same,
+    unchanged, file are served from them.
     """
     logger.info("\t\tReading in log from {}".format(filepath))
+    suffix = log_suffix(filepath)
+    if streaming:
+        if suffix not in stream_log:
+            raise Exception('streaming not supported for {} logs'.format(suffix))
+        return stream_log[suffix](filepath)
+    if cache_dir is not None:
+        return get_cached_log(filepath, cache_dir, import_log[suffix])
     # uses the xes, or csv importer depending on file type
-    return import_log[pathlib.Path(filepath).suffixes[0]](filepath)
+    return import_log[suffix](filepath)
+
+
+def warm_log_cache(directory: str, cache_dir: str) -> None:
+    """Caches every log in directory that is not already cached"""
+    for filepath in sorted(glob.glob(os.path.join(directory, '*'))):
+        if log_suffix(filepath) in import_log and not is_cached(filepath, cache_dir):
+            get_log(filepath=filepath, cache_dir=cache_dir)
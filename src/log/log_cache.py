@@ -0,0 +1,190 @@
+import datetime
+import glob
+import hashlib
+import json
+import logging
+import os
+
+import pyarrow as pa
+from pm4py.objects.log.log import EventLog, Trace, Event
+
+logger = logging.getLogger(__name__)
+
+TRACES_SUFFIX = '.traces.arrow'
+EVENTS_SUFFIX = '.events.arrow'
+N_EVENTS_COLUMN = '__n_events__'
+UTC_OFFSET_SUFFIX = '__utcoffset__'
+DATETIME_METADATA = b'datetime_columns'
+LOG_METADATA = b'log'
+_LOG_PROPERTIES = ['attributes', 'extensions', 'omni_present', 'classifiers']
+
+_ARROW_TYPES = {
+    str: pa.string(),
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64()
+}
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class NotCacheableLog(Exception):
+    pass
+
+
+def _path_key(filepath: str) -> str:
+    return hashlib.sha1(os.path.abspath(filepath).encode()).hexdigest()
+
+
+def cache_key(filepath: str) -> str:
+    """Key of the cached copy of filepath, it changes whenever the file is touched or resized"""
+    stat = os.stat(filepath)
+    state = '{}:{}'.format(stat.st_mtime_ns, stat.st_size)
+    return _path_key(filepath) + '-' + hashlib.sha1(state.encode()).hexdigest()
+
+
+def _to_microseconds(value):
+    if value is None:
+        return None
+    return (value - (_EPOCH if value.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+
+
+def _from_microseconds(value, offset):
+    if value is None:
+        return None
+    if offset is None:
+        return _EPOCH + datetime.timedelta(microseconds=value)
+    return (_EPOCH_UTC + datetime.timedelta(microseconds=value)).astimezone(
+        datetime.timezone(datetime.timedelta(seconds=offset)))
+
+
+def _attributes_to_columns(attributes: list) -> tuple:
+    """Turns a list of attribute dicts into typed arrow columns, missing attributes become nulls
+
+    Datetimes are stored as UTC timestamps plus their UTC offset so that they round trip with their tzinfo.
+    """
+    keys = sorted(set(key for attribute in attributes for key in attribute))
+    columns, datetime_columns = {}, []
+    for key in keys:
+        values = [attribute.get(key) for attribute in attributes]
+        types = set(type(value) for value in values if value is not None)
+        if len(types) > 1:
+            raise NotCacheableLog('attribute {} has mixed types {}'.format(key, types))
+        value_type = types.pop() if types else str
+        if value_type in _ARROW_TYPES:
+            columns[key] = pa.array(values, type=_ARROW_TYPES[value_type])
+        elif value_type is datetime.datetime:
+            datetime_columns += [key]
+            columns[key] = pa.array([_to_microseconds(value) for value in values], type=pa.int64())
+            columns[key + UTC_OFFSET_SUFFIX] = pa.array(
+                [None if value is None or value.utcoffset() is None else int(value.utcoffset().total_seconds())
+                 for value in values], type=pa.int64())
+        else:
+            raise NotCacheableLog('attribute {} of unsupported type {}'.format(key, value_type))
+    return columns, datetime_columns
+
+
+def _columns_to_attributes(table: pa.Table) -> list:
+    datetime_columns = json.loads((table.schema.metadata or {}).get(DATETIME_METADATA, b'[]'))
+    columns = {
+        name: table.column(name).to_pylist()
+        for name in table.column_names
+        if name != N_EVENTS_COLUMN and not name.endswith(UTC_OFFSET_SUFFIX)
+    }
+    for name in datetime_columns:
+        offsets = table.column(name + UTC_OFFSET_SUFFIX).to_pylist()
+        columns[name] = [_from_microseconds(value, offset) for value, offset in zip(columns[name], offsets)]
+    names = list(columns)
+    return [
+        {name: value for name, value in zip(names, row) if value is not None}
+        for row in zip(*[columns[name] for name in names])
+    ] if names else [{} for _ in range(table.num_rows)]
+
+
+def _log_metadata(log: EventLog) -> bytes:
+    """Log level attributes, extensions, omni present values and classifiers of log, as json"""
+    try:
+        return json.dumps({name: getattr(log, name) for name in _LOG_PROPERTIES}).encode()
+    except TypeError as e:
+        raise NotCacheableLog('log level values are not json serialisable: {}'.format(e))
+
+
+def _write_table(columns: dict, datetime_columns: list, path: str, metadata: dict = None) -> None:
+    table = pa.table(columns)
+    table = table.replace_schema_metadata(
+        dict(metadata or {}, **{DATETIME_METADATA: json.dumps(datetime_columns).encode()}))
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_table(path: str) -> pa.Table:
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_cached_log(log: EventLog, filepath: str, cache_dir: str) -> None:
+    """Stores log as a flat trace table and a flat event table in cache_dir
+
+    The log level values of log, see _LOG_PROPERTIES, are kept in the metadata of the trace table.
+    """
+    log_metadata = _log_metadata(log)
+    trace_columns, trace_datetime_columns = _attributes_to_columns([dict(trace.attributes) for trace in log])
+    trace_columns[N_EVENTS_COLUMN] = pa.array([len(trace) for trace in log], type=pa.int64())
+    event_columns, event_datetime_columns = _attributes_to_columns(
+        [dict(event) for trace in log for event in trace])
+
+    invalidate_log_cache(cache_dir, filepath)
+    os.makedirs(cache_dir, exist_ok=True)
+    key = os.path.join(cache_dir, cache_key(filepath))
+    _write_table(trace_columns, trace_datetime_columns, key + TRACES_SUFFIX, {LOG_METADATA: log_metadata})
+    _write_table(event_columns, event_datetime_columns, key + EVENTS_SUFFIX)
+
+
+def is_cached(filepath: str, cache_dir: str) -> bool:
+    key = os.path.join(cache_dir, cache_key(filepath))
+    return os.path.exists(key + TRACES_SUFFIX) and os.path.exists(key + EVENTS_SUFFIX)
+
+
+def read_cached_log(filepath: str, cache_dir: str) -> EventLog:
+    """Rebuilds the cached EventLog of filepath, returns None if there is no valid cache entry"""
+    if not is_cached(filepath, cache_dir):
+        return None
+    key = os.path.join(cache_dir, cache_key(filepath))
+    traces_table = _read_table(key + TRACES_SUFFIX)
+    metadata = traces_table.schema.metadata or {}
+    if LOG_METADATA not in metadata:
+        # written before the log level values were cached, it is rebuilt
+        return None
+    events = [Event(attributes) for attributes in _columns_to_attributes(_read_table(key + EVENTS_SUFFIX))]
+
+    log = EventLog(**json.loads(metadata[LOG_METADATA]))
+    start = 0
+    for attributes, n_events in zip(_columns_to_attributes(traces_table),
+                                    traces_table.column(N_EVENTS_COLUMN).to_pylist()):
+        log.append(Trace(events[start:start + n_events], attributes=attributes))
+        start += n_events
+    return log
+
+
+def get_cached_log(filepath: str, cache_dir: str, import_log) -> EventLog:
+    log = read_cached_log(filepath, cache_dir)
+    if log is not None:
+        logger.info("\t\tRead cached log of {}".format(filepath))
+        return log
+    log = import_log(filepath)
+    try:
+        write_cached_log(log, filepath, cache_dir)
+    except NotCacheableLog as e:
+        logger.warning("\t\tLog {} not cached: {}".format(filepath, e))
+    return log
+
+
+def invalidate_log_cache(cache_dir: str, filepath: str = None) -> None:
+    """Removes the cache entries of filepath, or the whole cache if filepath is None"""
+    pattern = '*' if filepath is None else _path_key(filepath) + '-*'
+    for path in glob.glob(os.path.join(cache_dir, pattern + TRACES_SUFFIX)) + \
+            glob.glob(os.path.join(cache_dir, pattern + EVENTS_SUFFIX)):
+        os.remove(path)
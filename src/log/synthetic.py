@@ -0,0 +1,50 @@
+import datetime
+
+import numpy as np
+from pm4py.objects.log.log import EventLog, Trace, Event
+
+from src.log.common import export_log
+
+START_TIME = datetime.datetime(2020, 1, 1)
+
+
+def synthetic_log(n_traces: int, trace_length: int, n_activities: int, n_attributes: int = 0,
+                  n_attribute_values: int = 5, seed: int = 0) -> EventLog:
+    """Random event log, shaped like the ones the pipeline is run on
+
+    Every trace has between half and one and a half times trace_length events, named after n_activities
+    activities, each one with n_attributes categorical attributes and a timestamp. The 'true'/'false' label of
+    a trace depends on its first events, so there is something for the predictive models to learn.
+    """
+    random_state = np.random.RandomState(seed)
+    lengths = random_state.randint(max(1, trace_length // 2), trace_length + trace_length // 2 + 1, size=n_traces)
+    activities = random_state.randint(n_activities, size=lengths.sum())
+    values = random_state.randint(n_attribute_values, size=(lengths.sum(), n_attributes))
+    gaps = random_state.exponential(3600., size=lengths.sum())
+
+    log = EventLog()
+    start = 0
+    for trace_index, length in enumerate(lengths):
+        events = []
+        timestamp = START_TIME + datetime.timedelta(days=trace_index)
+        for position in range(start, start + length):
+            timestamp += datetime.timedelta(seconds=float(gaps[position]))
+            attributes = {
+                'concept:name': 'activity_{}'.format(activities[position]),
+                'time:timestamp': timestamp
+            }
+            for attribute in range(n_attributes):
+                attributes['attribute_{}'.format(attribute)] = 'value_{}'.format(values[position, attribute])
+            events.append(Event(attributes))
+        label = 'true' if activities[start:start + min(length, 3)].sum() % 2 == 0 else 'false'
+        log.append(Trace(events, attributes={'concept:name': 'trace_{}'.format(trace_index), 'label': label}))
+        start += length
+    return log
+
+
+def write_synthetic_log(filepath: str, n_traces: int, trace_length: int, n_activities: int, n_attributes: int = 0,
+                        n_attribute_values: int = 5, seed: int = 0) -> EventLog:
+    """Writes a synthetic_log to filepath, in the format given by its extension, and returns it"""
+    log = synthetic_log(n_traces, trace_length, n_activities, n_attributes, n_attribute_values, seed)
+    export_log['.' + filepath.rsplit('.', 1)[-1]](log, filepath)
+    return log
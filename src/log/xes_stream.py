@@ -0,0 +1,91 @@
+import logging
+from xml.etree.ElementTree import iterparse
+
+from pm4py.objects.log.log import Trace, Event
+from pm4py.objects.log.util import xes as xes_constants
+from pm4py.util.dt_parsing import factory as dt_parse_factory
+
+logger = logging.getLogger(__name__)
+
+_DATE_PARSER = dt_parse_factory.get()
+
+
+def _tag(elem) -> str:
+    return elem.tag.rsplit('}', 1)[-1]
+
+
+def _parse_boolean(value):
+    return str(value).lower() == 'true'
+
+
+_ATTRIBUTE_PARSER = {
+    xes_constants.TAG_STRING: str,
+    xes_constants.TAG_ID: str,
+    xes_constants.TAG_DATE: _DATE_PARSER.apply,
+    xes_constants.TAG_FLOAT: float,
+    xes_constants.TAG_INT: int,
+    xes_constants.TAG_BOOLEAN: _parse_boolean,
+    xes_constants.TAG_LIST: lambda _: None,
+}
+
+
+def _parse_attributes(elem) -> dict:
+    """Parses the typed attribute children of elem into a dict
+
+    Mirrors the pm4py importer: nested attributes become {'value': ..., 'children': {...}}.
+    """
+    attributes = {}
+    for child in elem:
+        tag = _tag(child)
+        if tag == xes_constants.TAG_VALUES:
+            attributes.update(_parse_attributes(child))
+            continue
+        if tag not in _ATTRIBUTE_PARSER:
+            continue
+        try:
+            value = _ATTRIBUTE_PARSER[tag](child.get(xes_constants.KEY_VALUE))
+        except (TypeError, ValueError):
+            logger.info('failed to parse {}: {}'.format(tag, child.get(xes_constants.KEY_VALUE)))
+            continue
+        if len(child):
+            value = {xes_constants.KEY_VALUE: value, xes_constants.KEY_CHILDREN: _parse_attributes(child)}
+        attributes[child.get(xes_constants.KEY_KEY)] = value
+    return attributes
+
+
+def _parse_trace(elem) -> Trace:
+    return Trace(
+        [Event(_parse_attributes(event)) for event in elem if _tag(event) == xes_constants.TAG_EVENT],
+        attributes=_parse_attributes(elem)
+    )
+
+
+def iterparse_xes(filepath: str):
+    """Yields the traces of the xes log at filepath one at a time
+
+    Only the trace being parsed is held in memory, every processed element is released from the tree.
+    """
+    context = iterparse(filepath, events=('start', 'end'))
+    _, root = next(context)
+    depth = 0
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0 and _tag(elem) == xes_constants.TAG_TRACE:
+            yield _parse_trace(elem)
+            root.clear()
+
+
+class XesTraceStream:
+    """Re-iterable view over an xes file, every iteration streams the traces from disk again
+
+    It can be passed to the feature encoders in place of an EventLog.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def __iter__(self):
+        return iterparse_xes(self.filepath)
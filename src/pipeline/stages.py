@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+from src.instrumentation.common import RECORDER
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = '.checkpoint.pickle'
+
+
+class Stage:
+    """Named step of a pipeline, function is called with CONF followed by the outputs of the inputs stages
+
+    The key of the stage covers the values of conf_keys in CONF, whatever fingerprint(CONF) returns, and the
+    keys of its inputs, so it changes whenever anything its output depends on does.
+    """
+
+    def __init__(self, name: str, function, inputs=(), conf_keys=(), fingerprint=None):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.conf_keys = list(conf_keys)
+        self.fingerprint = fingerprint
+
+
+def stage_keys(stages: list, CONF: dict) -> dict:
+    """Key of every stage, the stages are listed after the stages they take as inputs"""
+    keys = {}
+    for stage in stages:
+        missing = [name for name in stage.inputs if name not in keys]
+        if missing:
+            raise Exception('stage {} listed before its inputs {}'.format(stage.name, missing))
+        key = hashlib.sha1(stage.name.encode())
+        key.update(json.dumps({name: CONF.get(name) for name in stage.conf_keys}, sort_keys=True, default=str).encode())
+        if stage.fingerprint is not None:
+            key.update(str(stage.fingerprint(CONF)).encode())
+        for name in stage.inputs:
+            key.update(keys[name].encode())
+        keys[stage.name] = key.hexdigest()
+    return keys
+
+
+def run_stages(stages: list, CONF: dict, checkpoint_dir: str = None, targets=None) -> dict:
+    """Outputs of the targets stages, all of them by default, running only the stages they need
+
+    With a checkpoint_dir every stage output is persisted under its key, a stage whose key is already there
+    is loaded instead of run, so a rerun resumes at the first stage whose inputs changed.
+    """
+    stages_by_name = {stage.name: stage for stage in stages}
+    keys = stage_keys(stages, CONF)
+    outputs = {}
+
+    def output(name):
+        if name not in outputs:
+            stage = stages_by_name[name]
+            path = None
+            if checkpoint_dir is not None:
+                path = os.path.join(checkpoint_dir, name + '-' + keys[name] + CHECKPOINT_SUFFIX)
+            if path is not None and os.path.exists(path):
+                logger.info('STAGE {} loaded from checkpoint'.format(name))
+                with open(path, 'rb') as file:
+                    outputs[name] = pickle.load(file)
+            else:
+                inputs = [output(input_name) for input_name in stage.inputs]
+                logger.info('STAGE {}'.format(name))
+                with RECORDER.span(name, category='pipeline_stage'):
+                    outputs[name] = stage.function(CONF, *inputs)
+                if path is not None:
+                    _write_checkpoint(outputs[name], path)
+        return outputs[name]
+
+    return {name: output(name) for name in (targets if targets is not None else [stage.name for stage in stages])}
+
+
+def _write_checkpoint(value, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # written aside and swapped in, a crash while writing never leaves a truncated checkpoint behind
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump(value, file)
+    os.replace(path + '.tmp', path)
+
+
+def clear_checkpoints(checkpoint_dir: str, name: str = None) -> None:
+    if not os.path.isdir(checkpoint_dir):
+        return
+    for file_name in os.listdir(checkpoint_dir):
+        if file_name.endswith(CHECKPOINT_SUFFIX) and (name is None or file_name.startswith(name + '-')):
+            os.remove(os.path.join(checkpoint_dir, file_name))
@@ -0,0 +1,125 @@
+import numpy as np
+from pandas import DataFrame
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+
+from src.predictive_model.predictive_model import model_input
+
+MAX_STEP_SIZE = 2 ** 21
+
+
+class CompiledForest:
+    """Fitted RandomForestClassifier laid out as flat node arrays, evaluated on a whole batch at once
+
+    The nodes of all the trees are concatenated: feature, threshold and children hold the split of every
+    node, values the class probabilities of every leaf. A leaf is its own child, so walking max_depth steps
+    brings every (row, tree) pair to its leaf whatever its depth. The probabilities of the trees are then
+    summed in tree order and averaged, as the forest does with n_jobs=1, so predict_proba returns the very
+    same floats as forest.predict_proba.
+    Any other attribute is the one of forest, so the compiled model stands in for it.
+    """
+
+    def __init__(self, forest: RandomForestClassifier):
+        if forest.n_outputs_ != 1:
+            raise Exception('only single output forests can be compiled')
+        self.forest = forest
+        self.classes_ = forest.classes_
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+        self.roots = offsets[:-1].astype(np.intp)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.feature = np.concatenate([np.maximum(tree.feature, 0) for tree in trees]).astype(np.intp)
+        self.threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        self.children = np.concatenate([
+            np.column_stack([
+                np.where(tree.children_left >= 0, tree.children_left + offset, np.arange(tree.node_count) + offset),
+                np.where(tree.children_right >= 0, tree.children_right + offset, np.arange(tree.node_count) + offset)
+            ])
+            for tree, offset in zip(trees, offsets)
+        ]).astype(np.intp)
+        self.missing_go_to_left = np.concatenate([
+            tree.missing_go_to_left.astype(bool) for tree in trees
+        ]) if all(hasattr(tree, 'missing_go_to_left') for tree in trees) else None
+        self.values = np.concatenate([_leaf_probabilities(tree, forest.n_classes_) for tree in trees])
+
+    def __getattr__(self, name):
+        # only called for the attributes CompiledForest does not have, forest is looked up directly so that
+        # unpickling, which runs before it is set, does not recurse
+        if name == 'forest' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.forest, name)
+
+    def apply(self, X) -> np.ndarray:
+        """Index in the flat node arrays of the leaf of every row in every tree"""
+        leaves = [self._apply(chunk) for chunk in self._chunks(X)]
+        return np.concatenate(leaves) if leaves else np.empty((0, len(self.roots)), dtype=np.intp)
+
+    def predict_proba(self, X) -> np.ndarray:
+        probabilities = [
+            # summed along the first axis, the trees are added one at a time in their order
+            self.values[self._apply(chunk).T].sum(axis=0) / len(self.roots)
+            for chunk in self._chunks(X)
+        ]
+        if not probabilities:
+            return np.empty((0, len(self.classes_)), dtype=np.float64)
+        return np.concatenate(probabilities)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def _chunks(self, X):
+        """Row chunks of X as float32 matrices, as the trees see them, small enough to walk all trees at once"""
+        X = model_input(X)
+        if isinstance(X, DataFrame):
+            X = X.to_numpy(dtype=np.float32)
+        if not sparse.issparse(X):
+            X = np.asarray(X, dtype=np.float32)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+        step = max(1, MAX_STEP_SIZE // (len(self.roots) * max(1, len(self.classes_))))
+        for start in range(0, X.shape[0], step):
+            chunk = X[start:start + step]
+            yield chunk.toarray().astype(np.float32) if sparse.issparse(chunk) else chunk
+
+    def _apply(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            # the trees send a row left when its value is <= threshold, compared in double precision
+            right = values.astype(np.float64) > self.threshold[nodes]
+            if self.missing_go_to_left is not None:
+                right = np.where(np.isnan(values), ~self.missing_go_to_left[nodes], right)
+            nodes = self.children[nodes, right.astype(np.intp)]
+        return nodes
+
+
+def _leaf_probabilities(tree, n_classes) -> np.ndarray:
+    """Class probabilities of every node, normalised as DecisionTreeClassifier.predict_proba does"""
+    values = tree.value[:, 0, :n_classes].astype(np.float64)
+    normalizer = values.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    values /= normalizer
+    return values
+
+
+def compile_forest(forest: RandomForestClassifier, X=None) -> CompiledForest:
+    """CompiledForest of forest, checked on X to give exactly the probabilities of forest when given"""
+    compiled = CompiledForest(forest)
+    if X is not None:
+        n_jobs = forest.n_jobs
+        try:
+            # with more jobs the forest adds up its trees in whatever order they complete
+            forest.n_jobs = 1
+            expected = forest.predict_proba(X)
+        finally:
+            forest.n_jobs = n_jobs
+        if not np.array_equal(compiled.predict_proba(X), expected):
+            raise Exception('compiled forest does not match the predictions of the forest')
+    return compiled
+
+
+def fitted_model(model):
+    """The scikit-learn model behind model, for the tools that inspect its type, as the explainers"""
+    return model.forest if isinstance(model, CompiledForest) else model
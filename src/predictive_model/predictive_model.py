@@ -1,10 +1,12 @@
 import logging
 
+import pandas as pd
 from hyperopt import STATUS_OK, STATUS_FAIL
 from pandas import DataFrame
 from sklearn.ensemble import RandomForestClassifier
 
 from src.evaluation.common import evaluate
+from src.instrumentation.common import measured
 from src.predictive_model.common import PredictionMethods
 
 logger = logging.getLogger(__name__)
@@ -15,6 +17,14 @@ def drop_columns(df: DataFrame) -> DataFrame:
     return df
 
 
+def model_input(df: DataFrame):
+    """CSR matrix of df when all its columns are sparse, so the sparse encodings reach the models as they are"""
+    if isinstance(df, DataFrame) and len(df.columns) and \
+            all(isinstance(dtype, pd.SparseDtype) for dtype in df.dtypes):
+        return df.sparse.to_coo().tocsr()
+    return df
+
+
 class PredictiveModel:
 
     def __init__(self, model_type, train_df, validate_df):
@@ -27,39 +37,61 @@ class PredictiveModel:
         self.validate_df = drop_columns(validate_df)
 
     def train_and_evaluate_configuration(self, config, target):
-        try:
-            model = self._instantiate_model(config)
-
-            model.fit(self.train_df, self.full_train_df['label'])
-
-            predicted = model.predict(self.validate_df)
-            scores = model.predict_proba(self.validate_df)[:, 1]
-
-            actual = self.full_validate_df['label']
-
-            result = evaluate(actual, predicted, scores, loss=target)
-
-            return {
-                'status': STATUS_OK,
-                'loss': - result['loss'], #we are using fmin for hyperopt
-                'exception': None,
-                'config': config,
-                'model': model,
-                'result': result,
-            }
-        except Exception as e:
-            return {
-                'status': STATUS_FAIL,
-                'loss': 0,
-                'exception': str(e)
-            }
+        return train_and_evaluate_configuration(
+            self.model_type,
+            config,
+            target,
+            self.train_df,
+            self.full_train_df['label'],
+            self.validate_df,
+            self.full_validate_df['label']
+        )
 
     def _instantiate_model(self, config):
-        if self.model_type == PredictionMethods.RANDOM_FOREST.value:
-            model = RandomForestClassifier(**config)
-        elif self.model_type == PredictionMethods.LSTM.value:
-            raise Exception('not yet supported model_type')
-        else:
-            raise Exception('unsupported model_type')
-        return model
-
+        return instantiate_model(self.model_type, config)
+
+
+def train_and_evaluate_configuration(model_type, config, target, train_df, train_labels, validate_df, validate_labels):
+    with measured('trial', 'hyperopt_trial', items=len(train_df)) as timing:
+        result = _train_and_evaluate_configuration(
+            model_type, config, target, train_df, train_labels, validate_df, validate_labels)
+    result['timing'] = timing
+    return result
+
+
+def _train_and_evaluate_configuration(model_type, config, target, train_df, train_labels, validate_df, validate_labels):
+    try:
+        model = instantiate_model(model_type, config)
+        train_df, validate_df = model_input(train_df), model_input(validate_df)
+
+        model.fit(train_df, train_labels)
+
+        predicted = model.predict(validate_df)
+        scores = model.predict_proba(validate_df)[:, 1]
+
+        result = evaluate(validate_labels, predicted, scores, loss=target)
+
+        return {
+            'status': STATUS_OK,
+            'loss': - result['loss'], #we are using fmin for hyperopt
+            'exception': None,
+            'config': config,
+            'model': model,
+            'result': result,
+        }
+    except Exception as e:
+        return {
+            'status': STATUS_FAIL,
+            'loss': 0,
+            'exception': str(e)
+        }
+
+
+def instantiate_model(model_type, config):
+    if model_type == PredictionMethods.RANDOM_FOREST.value:
+        model = RandomForestClassifier(**config)
+    elif model_type == PredictionMethods.LSTM.value:
+        raise Exception('not yet supported model_type')
+    else:
+        raise Exception('unsupported model_type')
+    return model
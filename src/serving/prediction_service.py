@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from src.encoding.data_encoder import PADDING_VALUE
+from src.encoding.feature_encoder.event_table import MISSING_EVENT_ATTRIBUTE, MISSING_TRACE_ATTRIBUTE
+
+logger = logging.getLogger(__name__)
+
+PREFIX_ = 'prefix_'
+TTL = 3600.
+MAX_BATCH_SIZE = 256
+MAX_DELAY = 0.005
+CAPACITY = 1024
+LATENCY_WINDOW = 10000
+
+
+class ServiceMetrics:
+    """Latency of the last LATENCY_WINDOW predictions, and counters since the service started"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.events = 0
+        self.batches = 0
+        self.errors = 0
+        self.evicted_cases = 0
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        latencies = np.array(self.latencies, dtype=float) * 1000
+        return {
+            'events': self.events,
+            'batches': self.batches,
+            'mean_batch_size': self.events / self.batches if self.batches else None,
+            'errors': self.errors,
+            'evicted_cases': self.evicted_cases,
+            'throughput': self.events / elapsed if elapsed > 0 else None,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None
+        }
+
+
+class PredictionService:
+    """Predictions on the prefix of every running case, updated as each of its events arrives
+
+    columns are the feature columns the model was fitted on, laid out by simple_features or complex_features.
+    The encoded rows of the running cases are kept in one matrix, each new event only writes its own columns,
+    and the events arriving within max_delay of each other go through model.predict_proba together, up to
+    max_batch_size of them. As in the offline encodings, events past the prefix length leave the row as it is.
+    Cases idle for longer than ttl seconds are dropped.
+    """
+
+    def __init__(self, model, encoder, columns, ttl: float = TTL, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_delay: float = MAX_DELAY, capacity: int = CAPACITY):
+        self.model = model
+        self.encoder = encoder
+        self.columns = list(columns)
+        self.ttl = ttl
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.metrics = ServiceMetrics()
+        self._layout(self.columns)
+
+        self._vocabularies = [
+            dict(zip(*encoder.get_values(column))) if encoder.is_encoded(column) else None
+            for column in self.columns
+        ]
+        self._empty_row = np.array([
+            self._code(index, MISSING_TRACE_ATTRIBUTE if column in self._trace_columns else PADDING_VALUE)
+            for index, column in enumerate(self.columns)
+        ], dtype=np.float32)
+        self._labels = [str(label) for label in encoder.decode_column(model.classes_, 'label')]
+
+        self._rows = np.tile(self._empty_row, (capacity, 1))
+        self._n_events = np.zeros(capacity, dtype=int)
+        self._last_seen = np.zeros(capacity, dtype=float)
+        self._slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._last_eviction = time.monotonic()
+        self._queue = None
+
+    def _layout(self, columns: list) -> None:
+        """Column indexes of the trace attributes and, per position, of the activity (None) and event attributes"""
+        if PREFIX_ + '1' not in columns:
+            raise Exception('only the simple and complex encodings can be served')
+        first_event_column = columns.index(PREFIX_ + '1')
+        self._trace_columns = {column: index for index, column in enumerate(columns[:first_event_column])}
+        self.prefix_length = 0
+        while PREFIX_ + str(self.prefix_length + 1) in columns:
+            self.prefix_length += 1
+        next_position = columns.index(PREFIX_ + '2') if self.prefix_length > 1 else len(columns)
+        event_attributes = [column[:-len('_1')] for column in columns[first_event_column + 1:next_position]]
+        self._event_columns = [
+            [(None, columns.index(PREFIX_ + str(position)))] +
+            [(attribute, columns.index(attribute + '_' + str(position))) for attribute in event_attributes]
+            for position in range(1, self.prefix_length + 1)
+        ]
+
+    def _code(self, index: int, value) -> float:
+        """Value of column index as Encoder.encode writes it, unknown values become PADDING_VALUE"""
+        vocabulary = self._vocabularies[index]
+        if vocabulary is not None:
+            return vocabulary.get(str(value), PADDING_VALUE)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return PADDING_VALUE
+
+    def _slot(self, case_id) -> int:
+        if case_id not in self._slots:
+            if not self._free:
+                # doubles the capacity, the rows of the running cases keep their slots
+                capacity = len(self._rows)
+                self._rows = np.concatenate([self._rows, np.tile(self._empty_row, (capacity, 1))])
+                self._n_events = np.concatenate([self._n_events, np.zeros(capacity, dtype=int)])
+                self._last_seen = np.concatenate([self._last_seen, np.zeros(capacity, dtype=float)])
+                self._free = list(range(2 * capacity - 1, capacity - 1, -1))
+            self._slots[case_id] = self._free.pop()
+        return self._slots[case_id]
+
+    def update(self, event: dict, now: float) -> np.ndarray:
+        """Writes event into the row of its case, returns a copy of the updated row
+
+        event holds the 'case_id' and 'activity', optionally the event 'attributes' and the 'trace_attributes'.
+        """
+        slot = self._slot(event['case_id'])
+        row = self._rows[slot]
+        for attribute, value in event.get('trace_attributes', {}).items():
+            if attribute in self._trace_columns:
+                index = self._trace_columns[attribute]
+                row[index] = self._code(index, value)
+
+        position = self._n_events[slot]
+        if position < self.prefix_length:
+            attributes = event.get('attributes', {})
+            for attribute, index in self._event_columns[position]:
+                value = event['activity'] if attribute is None else \
+                    attributes.get(attribute, MISSING_EVENT_ATTRIBUTE)
+                row[index] = self._code(index, value)
+        self._n_events[slot] = position + 1
+        self._last_seen[slot] = now
+        return row.copy()
+
+    def close(self, case_id) -> None:
+        if case_id in self._slots:
+            slot = self._slots.pop(case_id)
+            self._rows[slot] = self._empty_row
+            self._n_events[slot] = 0
+            self._free.append(slot)
+
+    def evict_idle(self, now: float) -> list:
+        """Closes the cases without events for longer than ttl, returns their ids"""
+        idle = [case_id for case_id, slot in self._slots.items() if now - self._last_seen[slot] > self.ttl]
+        for case_id in idle:
+            self.close(case_id)
+        self.metrics.evicted_cases += len(idle)
+        self._last_eviction = now
+        return idle
+
+    @property
+    def active_cases(self) -> int:
+        return len(self._slots)
+
+    def predict_batch(self, events: list) -> list:
+        """Updates the cases of events in order and predicts all of them with one predict_proba call
+
+        Every event is predicted on the prefix of its case right after it, so a case can appear more than once.
+        An event with 'end' set closes its case once predicted.
+        """
+        now = time.monotonic()
+        rows, responses = [], []
+        for event in events:
+            response = {'case_id': event.get('case_id')}
+            if 'id' in event:
+                response['id'] = event['id']
+            try:
+                rows.append(self.update(event, now))
+                response['events'] = int(self._n_events[self._slots[event['case_id']]])
+                if event.get('end', False):
+                    self.close(event['case_id'])
+            except Exception as e:
+                response['error'] = 'invalid event: {}'.format(e)
+                self.metrics.errors += 1
+            responses.append(response)
+
+        if rows:
+            probabilities = self.model.predict_proba(np.stack(rows))
+            predicted = iter(zip(np.argmax(probabilities, axis=1), probabilities))
+            for response in responses:
+                if 'error' not in response:
+                    label, label_probabilities = next(predicted)
+                    response['prediction'] = self._labels[label]
+                    response['probabilities'] = dict(zip(self._labels, label_probabilities.tolist()))
+        self.metrics.events += len(events)
+        self.metrics.batches += 1
+
+        if now - self._last_eviction > self.ttl / 2:
+            self.evict_idle(now)
+        return responses
+
+    async def predict(self, event: dict) -> dict:
+        """Prediction for event, batched with the other events submitted while run is waiting"""
+        future = asyncio.get_running_loop().create_future()
+        await self._pending().put((event, time.perf_counter(), future))
+        return await future
+
+    async def run(self) -> None:
+        """Collects the submitted events into batches until cancelled, evicting the idle cases meanwhile"""
+        queue = self._pending()
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = [await asyncio.wait_for(queue.get(), timeout=self.ttl / 2)]
+            except asyncio.TimeoutError:
+                self.evict_idle(time.monotonic())
+                continue
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout=timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+
+            try:
+                responses = self.predict_batch([event for event, _, _ in batch])
+            except Exception as e:
+                logger.exception('prediction batch failed')
+                responses = [{'case_id': event.get('case_id'), 'error': str(e)} for event, _, _ in batch]
+            done = time.perf_counter()
+            for (_, arrival, future), response in zip(batch, responses):
+                self.metrics.latencies.append(done - arrival)
+                future.set_result(response)
+
+    def _pending(self) -> asyncio.Queue:
+        # created on first use, inside the event loop it belongs to
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def metrics_summary(self) -> dict:
+        return dict(self.metrics.summary(), active_cases=self.active_cases)
+
+
+async def serve_ndjson(service: PredictionService, reader: asyncio.StreamReader, write) -> None:
+    """Answers every json line read from reader with a json line passed to write, until reader ends
+
+    A line is an event for PredictionService.predict, or {"metrics": true} for the metrics of the service.
+    The events are answered as their batch completes, possibly out of order, 'id' is echoed back to match them.
+    """
+    batcher = asyncio.ensure_future(service.run())
+    try:
+        await _answer_lines(service, reader, write)
+    finally:
+        batcher.cancel()
+
+
+async def serve_stdio(service: PredictionService) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    await serve_ndjson(service, reader, write)
+
+
+async def serve_tcp(service: PredictionService, host: str, port: int) -> None:
+    """serve_ndjson on every connection, the connections share the cases and the batches of service"""
+    async def handle(reader, writer):
+        await _answer_lines(service, reader, lambda text: writer.write(text.encode()))
+        writer.close()
+
+    batcher = asyncio.ensure_future(service.run())
+    server = await asyncio.start_server(handle, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+
+
+async def _answer_lines(service: PredictionService, reader: asyncio.StreamReader, write) -> None:
+    pending = set()
+
+    async def answer(request):
+        write(json.dumps(await service.predict(request)) + '\n')
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            write(json.dumps({'error': 'invalid json: {}'.format(e)}) + '\n')
+            continue
+        if not isinstance(request, dict):
+            error = 'invalid request: expected a json object, got {}'.format(type(request).__name__)
+            write(json.dumps({'error': error}) + '\n')
+            continue
+        if request.get('metrics', False):
+            write(json.dumps(service.metrics_summary()) + '\n')
+            continue
+        # every event is answered on its own task, so the next lines are read while its batch is pending
+        task = asyncio.ensure_future(answer(request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)